@@ -0,0 +1,231 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Defaults for the bounded history
+MAX_MESSAGES = 12  # Messages kept verbatim per session; older ones are folded into the summary
+KEEP_MESSAGES = 6  # Messages left verbatim after a summarization
+IDLE_TIMEOUT = 24 * 60 * 60  # Seconds before an idle session expires
+MAX_SESSIONS = 1000  # In-memory backend only: least recently used sessions are evicted beyond this
+
+Summarizer = Callable[[str, List[Dict]], str]
+
+class ConversationStore(ABC):
+    """
+    Per-session chat history with a bounded number of verbatim messages
+
+    Once a session grows past max_messages, compact() folds the oldest messages into a
+    rolling summary by the summarizer (previous summary, messages) -> new summary,
+    so the prompt sent with every turn stays bounded. Subclasses provide storage.
+    """
+
+    def __init__(self, summarizer: Optional[Summarizer] = None, max_messages: int = MAX_MESSAGES,
+                 keep_messages: int = KEEP_MESSAGES, idle_timeout: int = IDLE_TIMEOUT):
+        self.summarizer = summarizer
+        self.max_messages = max_messages
+        self.keep_messages = keep_messages
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+
+    # Storage hooks
+    @abstractmethod
+    def _get(self, session_id: str) -> Optional[Dict]:
+        """Read a session's conversation, or None if it doesn't exist"""
+
+    @abstractmethod
+    def _put(self, session_id: str, conversation: Dict) -> None:
+        """Write a session's conversation and mark it as active"""
+
+    @abstractmethod
+    def _delete(self, session_id: str) -> None:
+        """Delete a session's conversation"""
+
+    @abstractmethod
+    def _expire(self, cutoff: float) -> int:
+        """Delete conversations last updated before cutoff; returns the number removed"""
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Make a read-modify-write of the storage atomic"""
+        with self.lock:
+            yield
+
+    def load(self, session_id: str) -> Dict:
+        """Get a session's conversation as {"summary", "messages"}"""
+        with self.transaction():
+            conversation = self._get(session_id)
+        return conversation or {'summary': '', 'messages': []}
+
+    def append(self, session_id: str, message: Dict) -> None:
+        """Add a message to a session"""
+        with self.transaction():
+            conversation = self._get(session_id) or {'summary': '', 'messages': []}
+            conversation['messages'].append(message)
+            self._put(session_id, conversation)
+
+    def compact(self, session_id: str) -> None:
+        """
+        Fold the oldest messages into the summary if the history is full
+
+        The summarizer runs outside the lock; its result is only written if the
+        summarized messages are still at the start of the history by then.
+        """
+        conversation = self.load(session_id)
+        if len(conversation['messages']) <= self.max_messages:
+            return
+
+        cut = len(conversation['messages']) - self.keep_messages
+        # Don't start the verbatim history with an assistant reply to a summarized question
+        while cut < len(conversation['messages']) and conversation['messages'][cut]['role'] != 'user':
+            cut += 1
+        older = conversation['messages'][:cut]
+        summary = conversation['summary']
+        if self.summarizer:
+            try:
+                summary = self.summarizer(summary, older)
+            except Exception as e:
+                # The older messages are dropped either way so the history stays bounded
+                print(f"Error summarizing conversation: {e}")
+
+        with self.transaction():
+            current = self._get(session_id)
+            if current is None or current['messages'][:cut] != older:
+                # Cleared or compacted concurrently, e.g. from another tab
+                return
+            self._put(session_id, {'summary': summary, 'messages': current['messages'][cut:]})
+
+    def prompt_messages(self, session_id: str) -> List[Dict]:
+        """Get the messages to send to the model: the summary (if any) followed by the recent history"""
+        conversation = self.load(session_id)
+        messages = list(conversation['messages'])
+        if conversation['summary']:
+            messages.insert(0, {
+                'role': 'system',
+                'content': f"Summary of the earlier conversation with this user: {conversation['summary']}"
+            })
+        return messages
+
+    def clear(self, session_id: str) -> None:
+        """Delete a session's history"""
+        with self.transaction():
+            self._delete(session_id)
+
+    def expire(self) -> int:
+        """Delete sessions idle for longer than idle_timeout; returns the number removed"""
+        with self.transaction():
+            return self._expire(time.time() - self.idle_timeout)
+
+class InMemoryConversationStore(ConversationStore):
+    """Conversations kept in this process, evicting the least recently used beyond max_sessions"""
+
+    def __init__(self, *args, max_sessions: int = MAX_SESSIONS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    def _get(self, session_id: str) -> Optional[Dict]:
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return None
+        return {'summary': entry['summary'], 'messages': list(entry['messages'])}
+
+    def _put(self, session_id: str, conversation: Dict) -> None:
+        self.sessions[session_id] = {**conversation, 'updated_at': time.time()}
+        self.sessions.move_to_end(session_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    def _delete(self, session_id: str) -> None:
+        self.sessions.pop(session_id, None)
+
+    def _expire(self, cutoff: float) -> int:
+        removed = 0
+        # Sessions are ordered by last update, so stop at the first one still active
+        while self.sessions:
+            session_id, entry = next(iter(self.sessions.items()))
+            if entry['updated_at'] >= cutoff:
+                break
+            del self.sessions[session_id]
+            removed += 1
+        return removed
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Conversations persisted in SQLite, keeping the histories on disk instead of in server memory
+
+    Rows outlive a restart, but the chat UI issues a new session id per browser session,
+    so only expire() ever touches them after that.
+
+    WAL mode needs shared memory between the processes using the database, so it must live
+    on a local disk of a single host; it can't be shared by replicas over a network volume.
+    Processes on that host can share it: every read-modify-write runs in an immediate transaction.
+    """
+
+    def __init__(self, db_path: str, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Transactions are managed explicitly in transaction()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA busy_timeout=5000")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at)"
+        )
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self.lock:
+            # Take the write lock up front so other processes can't interleave their own update
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def _get(self, session_id: str) -> Optional[Dict]:
+        row = self.connection.execute(
+            "SELECT summary, messages FROM conversations WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'summary': row[0], 'messages': json.loads(row[1])}
+
+    def _put(self, session_id: str, conversation: Dict) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO conversations (session_id, summary, messages, updated_at) VALUES (?, ?, ?, ?)",
+            (session_id, conversation['summary'], json.dumps(conversation['messages'], ensure_ascii=False),
+             time.time())
+        )
+
+    def _delete(self, session_id: str) -> None:
+        self.connection.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+
+    def _expire(self, cutoff: float) -> int:
+        return self.connection.execute("DELETE FROM conversations WHERE updated_at < ?", (cutoff,)).rowcount
+
+def get_conversation_store(summarizer: Optional[Summarizer] = None) -> ConversationStore:
+    """
+    Create the conversation store configured in the environment
+
+    CONVERSATION_STORE selects "memory" (default) or "sqlite"; the SQLite backend
+    writes to CONVERSATION_DB (default: conversations.db next to this file), which
+    must be on a local disk.
+    """
+    backend = os.getenv('CONVERSATION_STORE', 'memory').lower()
+    if backend == 'memory':
+        return InMemoryConversationStore(summarizer)
+    if backend == 'sqlite':
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'conversations.db')
+        return SQLiteConversationStore(os.getenv('CONVERSATION_DB', default_path), summarizer)
+    raise ValueError(f"Unknown CONVERSATION_STORE: {backend}")
@@ -0,0 +1,164 @@
+import os
+import json
+import hashlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Arrow IPC (Feather v2) file, uncompressed so it can be memory-mapped and read without copies
+CHUNK_STORE_FILE = 'chunks.arrow'
+
+# Metadata fields promoted to their own columns for filtering and analytics;
+# the full metadata dict is kept as JSON in the "metadata" column
+METADATA_COLUMNS = {
+    'source_url': pa.string(),
+    'pdf_url': pa.string(),
+    'filename': pa.string(),
+    'content_type': pa.string(),
+    'chunk_type': pa.string(),
+    'section_header': pa.string(),
+    'chunk_index': pa.int32(),
+    'chunk_words': pa.int32(),
+    'chunk_tokens': pa.int32(),
+}
+
+def get_chunk_store_path(filename: str = CHUNK_STORE_FILE) -> str:
+    """Get the path of the chunk store next to the pipeline scripts"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+
+def text_hash(text: str) -> str:
+    """Get the content hash used to match chunks across runs"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def chunks_to_table(chunks: List[Dict], embeddings: Optional[np.ndarray] = None,
+                    embedding_model: Optional[str] = None) -> pa.Table:
+    """
+    Convert chunk dicts ({"text", "metadata"}) into a columnar table
+
+    Args:
+        chunks: Chunks as produced by vectorize_qdrant.process_pdf_content
+        embeddings: Optional float32 array of shape (len(chunks), dim)
+        embedding_model: Name of the model that produced the embeddings
+    """
+    columns = {
+        'text': pa.array([chunk['text'] for chunk in chunks], type=pa.string()),
+        'text_hash': pa.array([text_hash(chunk['text']) for chunk in chunks], type=pa.string()),
+    }
+    for name, dtype in METADATA_COLUMNS.items():
+        columns[name] = pa.array([chunk['metadata'].get(name) for chunk in chunks], type=dtype)
+    columns['metadata'] = pa.array([json.dumps(chunk['metadata'], ensure_ascii=False) for chunk in chunks],
+                                   type=pa.string())
+
+    table = pa.table(columns)
+    if embeddings is not None:
+        table = with_embeddings(table, embeddings, embedding_model)
+    return table
+
+def with_embeddings(table: pa.Table, embeddings: np.ndarray, embedding_model: Optional[str] = None) -> pa.Table:
+    """Return the table with its embedding column set to the given float32 matrix"""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if embeddings.shape[0] != table.num_rows:
+        raise ValueError(f"Got {embeddings.shape[0]} embeddings for {table.num_rows} chunks")
+    dim = embeddings.shape[1]
+    column = pa.FixedSizeListArray.from_arrays(pa.array(embeddings.reshape(-1), type=pa.float32()), dim)
+
+    if 'embedding' in table.column_names:
+        table = table.drop(['embedding'])
+    table = table.append_column('embedding', column)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[b'embedding_model'] = (embedding_model or '').encode('utf-8')
+    schema_metadata[b'embedding_dim'] = str(dim).encode('utf-8')
+    return table.replace_schema_metadata(schema_metadata)
+
+def embedding_model_of(table: pa.Table) -> Optional[str]:
+    """Get the name of the model that produced the table's embeddings, if any"""
+    if 'embedding' not in table.column_names or not table.schema.metadata:
+        return None
+    return table.schema.metadata.get(b'embedding_model', b'').decode('utf-8') or None
+
+def embedding_matrix(table: pa.Table) -> Optional[np.ndarray]:
+    """Get the embeddings as a (rows, dim) float32 matrix, without copying when possible"""
+    if 'embedding' not in table.column_names:
+        return None
+    column = table.column('embedding').combine_chunks()
+    values = column.flatten().to_numpy(zero_copy_only=False)
+    return values.reshape(len(column), column.type.list_size)
+
+def table_to_chunks(table: pa.Table) -> List[Dict]:
+    """Convert a chunk table back into chunk dicts ({"text", "metadata"})"""
+    texts = table.column('text').to_pylist()
+    metadata = table.column('metadata').to_pylist()
+    return [{'text': text, 'metadata': json.loads(meta)} for text, meta in zip(texts, metadata)]
+
+def write_chunk_store(table: pa.Table, filepath: Optional[str] = None) -> str:
+    """Atomically write a chunk table to an Arrow IPC file"""
+    filepath = filepath or get_chunk_store_path()
+    temp_filename = f"{filepath}.tmp"
+    try:
+        with pa.OSFile(temp_filename, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_filename, filepath)
+    finally:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+    print(f"Saved {table.num_rows} chunks to {filepath}")
+    return filepath
+
+def read_chunk_store(filepath: Optional[str] = None) -> Optional[pa.Table]:
+    """Memory-map a chunk store; returns None if it does not exist"""
+    filepath = filepath or get_chunk_store_path()
+    if not os.path.exists(filepath):
+        return None
+    source = pa.memory_map(filepath, 'r')
+    return pa.ipc.open_file(source).read_all()
+
+def reuse_embeddings(table: pa.Table, previous: Optional[pa.Table],
+                     embedding_model: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Carry over embeddings from a previous store for chunks whose text is unchanged
+
+    Returns:
+        Boolean mask of rows that still need embedding, and the float32 matrix
+        (rows without a previous embedding are zero), or None if nothing can be reused
+    """
+    rows = table.num_rows
+    if previous is None or embedding_model_of(previous) != embedding_model:
+        return np.ones(rows, dtype=bool), None
+
+    previous_matrix = embedding_matrix(previous)
+    previous_index = {value: i for i, value in enumerate(previous.column('text_hash').to_pylist())}
+    matrix = np.zeros((rows, previous_matrix.shape[1]), dtype=np.float32)
+    missing = np.ones(rows, dtype=bool)
+    for row, value in enumerate(table.column('text_hash').to_pylist()):
+        previous_row = previous_index.get(value)
+        if previous_row is not None:
+            matrix[row] = previous_matrix[previous_row]
+            missing[row] = False
+    return missing, matrix
+
+def describe_chunk_store(table: pa.Table) -> None:
+    """Print a short summary of the corpus in a chunk store"""
+    print(f"Chunks: {table.num_rows}")
+    if table.num_rows == 0:
+        return
+    tokens = table.column('chunk_tokens')
+    print(f"Tokens: total {pc.sum(tokens).as_py()}, mean {pc.mean(tokens).as_py():.1f}, "
+          f"max {pc.max(tokens).as_py()}")
+    print(f"Documents: {pc.count_distinct(table.column('filename')).as_py()}")
+    for column in ('content_type', 'chunk_type'):
+        counts = pc.value_counts(table.column(column)).to_pylist()
+        print(f"By {column}: " + ', '.join(f"{entry['values']}={entry['counts']}" for entry in counts))
+    model = embedding_model_of(table)
+    if model:
+        print(f"Embeddings: {model} ({table.schema.metadata[b'embedding_dim'].decode('utf-8')} dims)")
+    else:
+        print("Embeddings: none")
+
+if __name__ == "__main__":
+    store = read_chunk_store()
+    if store is None:
+        print(f"No chunk store found at {get_chunk_store_path()}. Please run vectorize_qdrant.py first.")
+    else:
+        describe_chunk_store(store)
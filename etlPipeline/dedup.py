@@ -0,0 +1,171 @@
+import zlib
+from typing import Dict, List
+import numpy as np
+
+# MinHash/LSH parameters: 16 bands of 8 rows put the LSH threshold around 0.7,
+# candidates are then verified against DEDUP_THRESHOLD
+NUM_PERM = 128
+NUM_BANDS = 16
+SHINGLE_SIZE = 5  # Words per shingle
+DEDUP_THRESHOLD = 0.85  # Estimated Jaccard similarity at which chunks are merged
+MAX_BATCH_SHINGLES = 50_000  # Shingles hashed per batch
+PERM_BLOCK = 32  # Permutations hashed at once; a batch's matrix is MAX_BATCH_SHINGLES x PERM_BLOCK (~13 MB)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_SHINGLE_BASE = np.uint64(1_000_003)
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hash the overlapping word shingles of a text into a uint64 array"""
+    words = text.lower().split()
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words),
+                              dtype=np.uint64, count=len(words))
+    if len(words) <= size:
+        size = len(words)
+    # Polynomial rolling combination of `size` consecutive word hashes, vectorized over positions
+    count = len(words) - size + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        shingles = shingles * _SHINGLE_BASE + word_hashes[offset:offset + count]
+    return np.unique(shingles & np.uint64(0xFFFFFFFF))
+
+def minhash_signatures(shingle_sets: List[np.ndarray], num_perm: int = NUM_PERM, seed: int = 1) -> np.ndarray:
+    """
+    Compute MinHash signatures for many shingle sets at once
+
+    Shingle sets are concatenated into batches and permuted in vectorized blocks
+    of PERM_BLOCK permutations; np.minimum.reduceat then takes the per-set minimum.
+
+    Returns:
+        (len(shingle_sets), num_perm) uint64 matrix; empty sets get all-max rows
+    """
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+    b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+
+    signatures = np.full((len(shingle_sets), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    start = 0
+    while start < len(shingle_sets):
+        # Gather sets until the batch is full (always at least one set)
+        end, total = start, 0
+        while end < len(shingle_sets) and (end == start or total + len(shingle_sets[end]) <= MAX_BATCH_SHINGLES):
+            total += len(shingle_sets[end])
+            end += 1
+
+        batch = [(row, shingles) for row, shingles in enumerate(shingle_sets[start:end], start) if len(shingles)]
+        if batch:
+            values = np.concatenate([shingles for _, shingles in batch])
+            offsets = np.cumsum([0] + [len(shingles) for _, shingles in batch[:-1]])
+            rows = [row for row, _ in batch]
+            for block in range(0, num_perm, PERM_BLOCK):
+                block_a = a[block:block + PERM_BLOCK]
+                block_b = b[block:block + PERM_BLOCK]
+                # 32-bit values times 31-bit coefficients stay below 2^63, so uint64 doesn't overflow;
+                # the in-place ops keep a single (shingles x PERM_BLOCK) matrix alive
+                permuted = values[:, None] * block_a[None, :]
+                permuted += block_b[None, :]
+                permuted %= _MERSENNE_PRIME
+                signatures[rows, block:block + PERM_BLOCK] = np.minimum.reduceat(permuted, offsets, axis=0)
+        start = end
+    return signatures
+
+def find_duplicate_groups(signatures: np.ndarray, valid: np.ndarray, num_bands: int = NUM_BANDS,
+                          threshold: float = DEDUP_THRESHOLD) -> np.ndarray:
+    """
+    Group near-duplicate rows using LSH banding
+
+    Returns:
+        For each row, the index of the representative (earliest) row of its group
+    """
+    rows, num_perm = signatures.shape
+    band_size = num_perm // num_bands
+    parent = np.arange(rows)
+
+    def find(row):
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+
+    valid_rows = np.flatnonzero(valid)
+    if len(valid_rows) < 2:
+        return parent
+
+    for band in range(num_bands):
+        band_values = np.ascontiguousarray(signatures[valid_rows, band * band_size:(band + 1) * band_size])
+        keys = band_values.view(np.dtype((np.void, band_values.dtype.itemsize * band_size))).ravel()
+        _, bucket_ids = np.unique(keys, return_inverse=True)
+
+        # Sort rows by bucket so that every bucket is a contiguous run
+        order = np.argsort(bucket_ids, kind='stable')
+        sorted_ids = bucket_ids[order]
+        boundaries = np.flatnonzero(np.diff(sorted_ids)) + 1
+        for bucket in np.split(order, boundaries):
+            if len(bucket) < 2:
+                continue
+            members = valid_rows[bucket]
+            first = members[0]
+            # Verify candidates against the estimated Jaccard similarity
+            similarity = (signatures[members[1:]] == signatures[first]).mean(axis=1)
+            for member in members[1:][similarity >= threshold]:
+                root_a, root_b = find(first), find(member)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    return np.array([find(row) for row in range(rows)])
+
+def deduplicate_chunks(chunks: List[Dict], threshold: float = DEDUP_THRESHOLD) -> List[Dict]:
+    """
+    Merge near-duplicate chunks across the whole corpus
+
+    Only chunks of the same chunk_type are compared. The earliest chunk of each group
+    is kept; its metadata gains "source_documents" (every document the text appears in)
+    and "duplicate_count".
+    """
+    if not chunks:
+        return chunks
+
+    shingle_sets = [shingle_hashes(chunk['text']) for chunk in chunks]
+    valid = np.array([len(shingles) > 0 for shingles in shingle_sets])
+    signatures = minhash_signatures(shingle_sets)
+
+    # Each chunk type is deduplicated on its own: a short document's section chunk is nearly
+    # identical to its own full-text chunk, and merging them would lose the section metadata
+    representatives = np.arange(len(chunks))
+    rows_by_type = {}
+    for row, chunk in enumerate(chunks):
+        rows_by_type.setdefault(chunk['metadata'].get('chunk_type'), []).append(row)
+    for rows in rows_by_type.values():
+        rows = np.asarray(rows)
+        group_rows = find_duplicate_groups(signatures[rows], valid[rows], threshold=threshold)
+        representatives[rows] = rows[group_rows]
+
+    groups = {}
+    for row, representative in enumerate(representatives):
+        groups.setdefault(int(representative), []).append(row)
+
+    deduplicated = []
+    for representative in sorted(groups):
+        members = groups[representative]
+        chunk = chunks[representative]
+        sources = []
+        seen = set()
+        for row in members:
+            metadata = chunks[row]['metadata']
+            key = (metadata.get('source_url'), metadata.get('pdf_url'), metadata.get('filename'))
+            if key not in seen:
+                seen.add(key)
+                sources.append({'source_url': key[0], 'pdf_url': key[1], 'filename': key[2]})
+        deduplicated.append({
+            'text': chunk['text'],
+            'metadata': {
+                **chunk['metadata'],
+                'source_documents': sources,
+                'duplicate_count': len(members)
+            }
+        })
+
+    print(f"Deduplication: {len(chunks)} chunks -> {len(deduplicated)} "
+          f"({len(chunks) - len(deduplicated)} near-duplicates merged)")
+    return deduplicated
@@ -0,0 +1,135 @@
+import os
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import numpy as np
+
+# Default models per backend
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+OPENAI_VECTOR_SIZE = 1536  # text-embedding-3-small dimension size
+OPENAI_MAX_TOKENS = 8191  # OpenAI's embedding model token limit
+LOCAL_MAX_SEQUENCE_LENGTH = 256  # Word pieces per text for the local model
+LOCAL_BATCH_SIZE = 64
+
+class EmbeddingBackend(ABC):
+    """Interface for turning texts into embedding vectors"""
+
+    # Identifies the model; stored with embeddings so vectors from different models are never mixed
+    name: str = ""
+    # Vector size, used to configure the Qdrant collection
+    dimension: int = 0
+    # Chunk size limit in tiktoken tokens
+    max_tokens: int = OPENAI_MAX_TOKENS
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into a (len(texts), dimension) float32 matrix"""
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single search query"""
+        return self.embed([text])[0].tolist()
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Embeddings from the OpenAI API"""
+
+    def __init__(self, model: str = OPENAI_EMBEDDING_MODEL, dimension: int = OPENAI_VECTOR_SIZE,
+                 api_key: Optional[str] = None):
+        from openai import OpenAI
+
+        self.name = model
+        self.dimension = dimension
+        self.max_tokens = OPENAI_MAX_TOKENS
+        self.client = OpenAI(api_key=api_key or os.getenv('OPENAI_API_KEY'))
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = self.client.embeddings.create(
+            model=self.name,
+            input=texts
+        )
+        return np.asarray([data.embedding for data in response.data], dtype=np.float32)
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """
+    Sentence embeddings computed locally on CPU with ONNX Runtime
+
+    Expects a directory holding an ONNX export of a sentence-transformers model
+    (e.g. all-MiniLM-L6-v2) as model.onnx together with its tokenizer.json.
+    Texts are embedded in batches with mean pooling and L2 normalization, and
+    ONNX Runtime spreads each batch over num_threads CPU threads.
+    """
+
+    def __init__(self, model_dir: str, batch_size: int = LOCAL_BATCH_SIZE,
+                 num_threads: Optional[int] = None, max_length: int = LOCAL_MAX_SEQUENCE_LENGTH):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("The local embedding backend requires onnxruntime and tokenizers "
+                              "(pip install onnxruntime tokenizers)") from e
+
+        model_path = os.path.join(model_dir, "model.onnx")
+        tokenizer_path = os.path.join(model_dir, "tokenizer.json")
+        for path in (model_path, tokenizer_path):
+            if not os.path.exists(path):
+                raise ValueError(f"Local embedding model file not found: {path}")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads or os.cpu_count() or 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        self.batch_size = batch_size
+        self.name = f"onnx:{os.path.basename(os.path.normpath(model_dir))}"
+        # Leave headroom since the model's word pieces outnumber tiktoken tokens
+        self.max_tokens = max_length // 2
+        self.dimension = self._detect_dimension()
+
+    def _detect_dimension(self) -> int:
+        size = self.session.get_outputs()[0].shape[-1]
+        if isinstance(size, int):
+            return size
+        # Dynamic output shape; find out by embedding a probe text
+        return self.embed(["dimension probe"]).shape[1]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        batches = []
+        for i in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[i:i + self.batch_size])
+            input_ids = np.asarray([encoding.ids for encoding in encodings], dtype=np.int64)
+            attention_mask = np.asarray([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+            token_embeddings = self.session.run(None, feeds)[0]
+            # Mean pooling over the non-padding tokens
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+        if not batches:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.concatenate(batches)
+
+def get_embedding_backend(backend: Optional[str] = None) -> EmbeddingBackend:
+    """
+    Create the embedding backend configured in the environment
+
+    EMBEDDING_BACKEND selects "openai" (default) or "onnx"; the ONNX backend
+    loads its model from LOCAL_EMBEDDING_MODEL_DIR.
+    """
+    backend = (backend or os.getenv('EMBEDDING_BACKEND', 'openai')).lower()
+    if backend == 'openai':
+        return OpenAIEmbeddingBackend()
+    if backend == 'onnx':
+        model_dir = os.getenv('LOCAL_EMBEDDING_MODEL_DIR')
+        if not model_dir:
+            raise ValueError("LOCAL_EMBEDDING_MODEL_DIR not found in environment variables")
+        threads = os.getenv('LOCAL_EMBEDDING_THREADS')
+        return OnnxEmbeddingBackend(model_dir, num_threads=int(threads) if threads else None)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
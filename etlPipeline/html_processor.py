@@ -0,0 +1,275 @@
+import os
+import json
+import hashlib
+from typing import Dict, List, Optional
+from datetime import datetime
+import lxml.html
+
+# Tags that never carry documentation text
+NON_TEXT_TAGS = {'script', 'style', 'noscript', 'template', 'svg'}
+# Tags that usually hold site chrome rather than documentation content
+CHROME_TAGS = {'nav', 'footer', 'aside', 'form', 'button', 'select', 'iframe'}
+# Whole class/id tokens marking site chrome such as menus and cookie banners
+BOILERPLATE_TOKENS = {'cookie', 'cookies', 'cookie-banner', 'cookie-notice', 'cookie-consent', 'consent',
+                      'navbar', 'nav-menu', 'main-menu', 'menu', 'breadcrumb', 'breadcrumbs', 'sidebar',
+                      'footer', 'site-footer', 'site-header', 'skip-link', 'social', 'social-links',
+                      'newsletter'}
+# ARIA roles of site chrome
+BOILERPLATE_ROLES = {'navigation', 'banner', 'contentinfo', 'complementary'}
+# A chrome candidate holding at least this share of the page's text is treated as content
+MAX_BOILERPLATE_TEXT_SHARE = 0.5
+HEADING_TAGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+BLOCK_TAGS = {'p', 'div', 'section', 'article', 'main', 'li', 'ul', 'ol', 'table', 'tr', 'td', 'th',
+              'pre', 'blockquote', 'dl', 'dt', 'dd', 'figure', 'figcaption', 'br'}
+
+class HTMLProcessor:
+    def __init__(self, manifest_file: str, pages_dir: str, output_path: str):
+        """
+        Initialize the HTML processor
+
+        Args:
+            manifest_file: Path to the page manifest written by web_scraper.py
+            pages_dir: Directory holding the page HTML saved during the crawl
+            output_path: Path where to save the processed results
+        """
+        self.manifest_file = manifest_file
+        self.pages_dir = pages_dir
+        self.output_path = output_path
+
+    def load_manifest(self) -> Dict:
+        """Load the page manifest from the JSON file"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading page manifest: {e}")
+            return {}
+
+    def load_previous_results(self) -> Dict:
+        """Load the results of the previous run, used to skip unchanged pages"""
+        try:
+            with open(self.output_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('processed_pages', {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @staticmethod
+    def _looks_like_chrome(elem, skip_header: bool) -> bool:
+        if elem.tag in CHROME_TAGS or (skip_header and elem.tag == 'header'):
+            return True
+        if elem.get('role', '').strip().lower() in BOILERPLATE_ROLES:
+            return True
+        tokens = set(elem.get('class', '').lower().split())
+        tokens.add(elem.get('id', '').strip().lower())
+        return not tokens.isdisjoint(BOILERPLATE_TOKENS)
+
+    def _is_boilerplate(self, elem, skip_header: bool, page_text_length: int) -> bool:
+        if elem.tag in NON_TEXT_TAGS:
+            return True
+        if not self._looks_like_chrome(elem, skip_header):
+            return False
+        # Never drop a wrapper holding the page title or most of the page's text
+        if next(elem.iter('h1'), None) is not None:
+            return False
+        return len(elem.text_content().strip()) < MAX_BOILERPLATE_TEXT_SHARE * page_text_length
+
+    def extract_sections(self, content: bytes) -> List[Dict]:
+        """
+        Strip boilerplate from a page and split its text into sections by heading
+
+        Returns:
+            List of sections in the same shape pdf_processor produces ({'header', 'content'});
+            text before the first heading goes into a section with an empty header
+        """
+        doc = lxml.html.fromstring(content)
+        # Prefer the main content area when the page marks one
+        content_roots = doc.xpath('//main') or doc.xpath('//article')
+        roots = content_roots or doc.xpath('//body') or [doc]
+        # Page-level <header> is site chrome, but inside <main>/<article> it holds the title
+        skip_header = not content_roots
+        page_text_length = sum(len(root.text_content().strip()) for root in roots)
+
+        sections = [{'header': '', 'content': []}]
+        buffer = []
+
+        def flush():
+            text = ' '.join(' '.join(buffer).split())
+            buffer.clear()
+            if text:
+                sections[-1]['content'].append(text)
+
+        def walk(elem):
+            if not isinstance(elem.tag, str):
+                # Comments and processing instructions only contribute their tail
+                if elem.tail:
+                    buffer.append(elem.tail)
+                return
+            if self._is_boilerplate(elem, skip_header, page_text_length):
+                if elem.tail:
+                    buffer.append(elem.tail)
+                return
+            if elem.tag in HEADING_TAGS:
+                flush()
+                header = ' '.join(elem.text_content().split())
+                if header:
+                    sections.append({'header': header, 'content': []})
+                if elem.tail:
+                    buffer.append(elem.tail)
+                return
+
+            is_block = elem.tag in BLOCK_TAGS
+            if is_block:
+                flush()
+            if elem.text:
+                buffer.append(elem.text)
+            for child in elem:
+                walk(child)
+            if is_block:
+                flush()
+            if elem.tail:
+                buffer.append(elem.tail)
+
+        for root in roots:
+            # The root itself is never boilerplate, even if its classes say e.g. "menu-open"
+            if root.text:
+                buffer.append(root.text)
+            for child in root:
+                walk(child)
+            flush()
+
+        return [section for section in sections if section['header'] or section['content']]
+
+    def process_single_page(self, url: str, record: Dict, previous: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Process a single crawled page and extract its text content
+
+        Args:
+            url: URL of the page
+            record: The page's entry in the page manifest
+            previous: The page's result from the previous run, reused if the content is unchanged
+
+        Returns:
+            Dictionary in the same shape as a processed PDF, or None if the page has no usable content
+        """
+        html_file = record.get('html_file')
+        if not html_file:
+            return None
+        filepath = os.path.join(self.pages_dir, html_file)
+        try:
+            with open(filepath, 'rb') as f:
+                content = f.read()
+
+            # Skip parsing entirely when the stored HTML and the page's videos are unchanged
+            videos = record.get('videos', [])
+            html_hasher = hashlib.sha256(content)
+            html_hasher.update('\n'.join(videos).encode('utf-8'))
+            html_hash = html_hasher.hexdigest()
+            if previous and previous['metadata'].get('html_hash') == html_hash:
+                return previous
+
+            sections = self.extract_sections(content)
+            if not sections:
+                return None
+
+            raw_texts = []
+            for section in sections:
+                if section['header']:
+                    raw_texts.append(section['header'])
+                raw_texts.extend(section['content'])
+            full_text = ' '.join(raw_texts)
+
+            # The HTML can change without the text changing (session tokens, markup), so
+            # also compare the extracted text before treating the page as updated
+            hasher = hashlib.sha256(full_text.encode('utf-8'))
+            hasher.update('\n'.join(videos).encode('utf-8'))
+            content_hash = hasher.hexdigest()
+            if previous and previous['metadata'].get('content_hash') == content_hash:
+                previous['metadata']['html_hash'] = html_hash
+                return previous
+
+            title = record.get('title') or (sections[0]['header'] if sections[0]['header'] else url)
+            processed_data = {
+                'filepath': filepath,
+                'source_url': url,
+                'pdf_url': None,
+                'content': {
+                    'full_text': full_text,
+                    'sections': [section for section in sections if section['header']],
+                    'raw_texts': raw_texts
+                },
+                'metadata': {
+                    'filename': title,
+                    'content_type': 'html',
+                    'content_hash': content_hash,
+                    'html_hash': html_hash,
+                    'video_urls': videos,
+                    'doc_metadata': {
+                        'schema_name': None,
+                        'version': None,
+                        'name': title,
+                        'origin': {
+                            'mimetype': 'text/html',
+                            'filename': html_file
+                        }
+                    },
+                    'processing_time': datetime.now().isoformat(),
+                    'word_count': len(full_text.split()),
+                    'section_count': sum(1 for section in sections if section['header'])
+                }
+            }
+            return processed_data
+
+        except Exception as e:
+            print(f"Error processing {url}: {str(e)}")
+            return None
+
+    def process_all_pages(self) -> None:
+        """Process all crawled pages and save results to a JSON file"""
+        manifest = self.load_manifest()
+        if not manifest:
+            print("No page manifest found. Please run web_scraper.py first.")
+            return
+
+        previous_results = self.load_previous_results()
+        processed_pages = {}
+        unchanged = 0
+        for url, record in manifest.items():
+            previous = previous_results.get(url)
+            result = self.process_single_page(url, record, previous)
+            if result is None:
+                continue
+            if result is previous:
+                unchanged += 1
+            processed_pages[url] = result
+
+        print(f"Processed {len(processed_pages)} pages ({unchanged} unchanged since last run)")
+
+        # Save results
+        try:
+            output_data = {
+                'metadata': {
+                    'total_pages': len(processed_pages),
+                    'unchanged_pages': unchanged,
+                    'processing_time': datetime.now().isoformat(),
+                    'success_rate': f"{len(processed_pages)}/{len(manifest)}"
+                },
+                'processed_pages': processed_pages
+            }
+
+            with open(self.output_path, 'w', encoding='utf-8') as f:
+                json.dump(output_data, f, ensure_ascii=False, indent=4)
+            print(f"\nResults successfully saved to: {self.output_path}")
+
+        except Exception as e:
+            print(f"Error saving results: {str(e)}")
+
+if __name__ == "__main__":
+    # Define paths relative to script location
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    manifest_file = os.path.join(current_dir, "page_manifest.json")
+    pages_dir = os.path.join(current_dir, "crawled_pages")
+    output_file = os.path.join(current_dir, "processed_pages.json")
+
+    # Create processor instance and run
+    processor = HTMLProcessor(manifest_file, pages_dir, output_file)
+    processor.process_all_pages()
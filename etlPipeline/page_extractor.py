@@ -0,0 +1,168 @@
+import os
+import re
+import json
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+import lxml.html
+from lxml.etree import ParserError
+
+# URLs of individual videos (watch/embed pages), as opposed to e.g. a channel linked in the footer
+VIDEO_URL_PATTERN = re.compile(
+    r"^https?://(?:www\.|m\.)?(?:"
+    r"youtube(?:-nocookie)?\.com/(?:watch\?|embed/|shorts/|live/)"
+    r"|youtu\.be/[\w-]+"
+    r"|(?:player\.)?vimeo\.com/(?:video/)?\d+"
+    r"|(?:fast\.)?wistia\.(?:com|net)/(?:medias|embed)/"
+    r"|loom\.com/(?:share|embed)/"
+    r"|(?:share|play)\.vidyard\.com/"
+    r")",
+    re.IGNORECASE
+)
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mov', '.m4v')
+# Links inside these elements are site chrome, never a page's own videos
+CHROME_TAGS = ('nav', 'header', 'footer')
+
+# Text and class hints used to spot PDF-related elements
+PDF_TEXT_HINTS = ('pdf', 'download', 'document')
+PDF_CLASS_HINTS = ('pdf', 'document', 'viewer')
+
+MANIFEST_FILE = 'page_manifest.json'
+
+def _is_video_url(url: str) -> bool:
+    return bool(VIDEO_URL_PATTERN.match(url)) or url.lower().split('?')[0].endswith(VIDEO_EXTENSIONS)
+
+def _in_site_chrome(elem) -> bool:
+    return next(elem.iterancestors(*CHROME_TAGS), None) is not None
+
+def _append_unique(items: List[str], seen: set, value: str) -> None:
+    if value not in seen:
+        seen.add(value)
+        items.append(value)
+
+def extract_page(content: bytes, url: str, diagnostics: bool = False) -> Dict:
+    """
+    Extract outlinks, PDF links, iframe sources and video references from a page in one pass
+
+    Args:
+        content: Raw HTML of the page
+        url: URL the page was fetched from, used to resolve relative links
+        diagnostics: Also collect PDF-related buttons, containers and scripts (used by pdf_analyzer)
+
+    Returns:
+        Dictionary with the extracted references, all as absolute URLs
+    """
+    record = {
+        'title': '',
+        'outlinks': [],
+        'pdf_links': [],
+        'iframes': [],
+        'videos': []
+    }
+    if diagnostics:
+        record.update({'pdf_elements': [], 'pdf_containers': [], 'pdf_scripts': []})
+
+    if not content or not content.strip():
+        return record
+
+    try:
+        doc = lxml.html.fromstring(content)
+    except ParserError:
+        # Nothing left to parse, e.g. a page of only whitespace and comments
+        return record
+    seen = {key: set() for key in ('outlinks', 'pdf_links', 'iframes', 'videos')}
+
+    for elem in doc.iter('title', 'a', 'button', 'iframe', 'video', 'source', 'embed', 'object', 'div', 'script'):
+        tag = elem.tag
+
+        if tag == 'title':
+            record['title'] = (elem.text_content() or '').strip()
+
+        elif tag == 'a':
+            href = elem.get('href')
+            if href:
+                absolute = urljoin(url, href.strip())
+                if absolute.lower().split('?')[0].endswith('.pdf'):
+                    _append_unique(record['pdf_links'], seen['pdf_links'], absolute)
+                elif _is_video_url(absolute):
+                    if not _in_site_chrome(elem):
+                        _append_unique(record['videos'], seen['videos'], absolute)
+                else:
+                    _append_unique(record['outlinks'], seen['outlinks'], absolute)
+
+        elif tag in ('iframe', 'embed', 'object'):
+            src = elem.get('src') or elem.get('data')
+            if src:
+                absolute = urljoin(url, src.strip())
+                _append_unique(record['iframes'], seen['iframes'], absolute)
+                if absolute.lower().split('?')[0].endswith('.pdf'):
+                    _append_unique(record['pdf_links'], seen['pdf_links'], absolute)
+                elif _is_video_url(absolute):
+                    _append_unique(record['videos'], seen['videos'], absolute)
+
+        elif tag in ('video', 'source'):
+            src = elem.get('src')
+            if src:
+                absolute = urljoin(url, src.strip())
+                # <source> also feeds <audio> and <picture>, so only count it under <video> or by its URL
+                parent = elem.getparent()
+                if tag == 'video' or (parent is not None and parent.tag == 'video') or _is_video_url(absolute):
+                    _append_unique(record['videos'], seen['videos'], absolute)
+
+        if not diagnostics:
+            continue
+
+        if tag in ('a', 'button'):
+            text = elem.text_content().strip()
+            if any(hint in text.lower() for hint in PDF_TEXT_HINTS):
+                record['pdf_elements'].append({
+                    'tag': tag,
+                    'text': text,
+                    'classes': elem.get('class', '').split(),
+                    'id': elem.get('id', 'No ID'),
+                    'link': elem.get('href', elem.get('onclick', 'No direct link'))
+                })
+        elif tag == 'div':
+            classes = elem.get('class', '')
+            if any(hint in classes.lower() for hint in PDF_CLASS_HINTS):
+                record['pdf_containers'].append({'id': elem.get('id', 'No ID'), 'classes': classes.split()})
+        elif tag == 'script':
+            script = elem.text or ''
+            if any(hint in script.lower() for hint in PDF_TEXT_HINTS):
+                record['pdf_scripts'].append(script[:200])
+
+    return record
+
+def get_manifest_path(filename: str = MANIFEST_FILE) -> str:
+    """Get the path of the page manifest next to the pipeline scripts"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+
+def load_manifest(filename: str = MANIFEST_FILE) -> Optional[Dict]:
+    """Load the page manifest written by web_scraper.py, or None if it does not exist"""
+    filepath = get_manifest_path(filename)
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError:
+        print(f"Error: {filepath} is not a valid JSON file.")
+        return None
+
+def save_manifest(manifest: Dict, filename: str = MANIFEST_FILE) -> bool:
+    """Atomically save the page manifest"""
+    filepath = get_manifest_path(filename)
+    temp_filename = f"{filepath}.tmp"
+    try:
+        with open(temp_filename, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=4, ensure_ascii=False)
+        os.replace(temp_filename, filepath)
+        print(f"Successfully saved manifest for {len(manifest)} pages to {filepath}")
+        return True
+    except Exception as e:
+        print(f"Error saving page manifest: {e}")
+        if os.path.exists(temp_filename):
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
+        return False
@@ -1,10 +1,6 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import json
-import os
 from dotenv import load_dotenv
-from webScraper import login_to_aparavi
+from web_scraper import login_to_aparavi
+from page_extractor import extract_page
 
 # Load environment variables
 load_dotenv()
@@ -17,49 +13,49 @@ def analyze_page(session, url):
             print(f"Failed to fetch page: Status code {response.status_code}")
             return
             
-        soup = BeautifulSoup(response.content, "html.parser")
+        # Collect links, embeds and PDF-related elements in a single parse
+        record = extract_page(response.content, url, diagnostics=True)
         
         # Look for potential PDF containers or buttons
         print("\nSearching for PDF-related elements...")
         
-        # Look for buttons or links with PDF-related text
-        pdf_elements = soup.find_all(lambda tag: tag.name in ['a', 'button'] and 
-                                   any(pdf_text in tag.get_text().lower() 
-                                       for pdf_text in ['pdf', 'download', 'document']))
-        
         print("\nPotential PDF-related elements found:")
-        for elem in pdf_elements:
+        for elem in record['pdf_elements']:
             print("\nElement:")
-            print(f"Tag: {elem.name}")
-            print(f"Text: {elem.get_text().strip()}")
-            print(f"Classes: {elem.get('class', [])}")
-            print(f"ID: {elem.get('id', 'No ID')}")
-            print(f"Href/Link: {elem.get('href', elem.get('onclick', 'No direct link'))}")
+            print(f"Tag: {elem['tag']}")
+            print(f"Text: {elem['text']}")
+            print(f"Classes: {elem['classes']}")
+            print(f"ID: {elem['id']}")
+            print(f"Href/Link: {elem['link']}")
+            
+        if record['pdf_links']:
+            print("\nFound PDF links:")
+            for pdf_link in record['pdf_links']:
+                print(f"PDF: {pdf_link}")
             
         # Look for iframes that might embed PDFs
-        iframes = soup.find_all('iframe')
-        if iframes:
+        if record['iframes']:
             print("\nFound iframes that might contain PDFs:")
-            for iframe in iframes:
-                print(f"Src: {iframe.get('src', 'No src')}")
-                print(f"Classes: {iframe.get('class', [])}")
+            for src in record['iframes']:
+                print(f"Src: {src}")
+                
+        if record['videos']:
+            print("\nFound video references:")
+            for video in record['videos']:
+                print(f"Video: {video}")
                 
         # Look for div containers that might hold PDFs
-        pdf_containers = soup.find_all('div', class_=lambda x: x and any(pdf_class in x.lower() 
-                                     for pdf_class in ['pdf', 'document', 'viewer']))
-        if pdf_containers:
+        if record['pdf_containers']:
             print("\nFound potential PDF containers:")
-            for container in pdf_containers:
-                print(f"ID: {container.get('id', 'No ID')}")
-                print(f"Classes: {container.get('class', [])}")
+            for container in record['pdf_containers']:
+                print(f"ID: {container['id']}")
+                print(f"Classes: {container['classes']}")
                 
         # Look for any script tags that might handle PDF loading
-        pdf_scripts = soup.find_all('script', string=lambda s: s and any(pdf_text in s.lower() 
-                                  for pdf_text in ['pdf', '.pdf', 'document']))
-        if pdf_scripts:
+        if record['pdf_scripts']:
             print("\nFound scripts that might handle PDFs:")
-            for script in pdf_scripts:
-                print(f"Script content preview: {script.string[:200] if script.string else 'No inline content'}")
+            for script in record['pdf_scripts']:
+                print(f"Script content preview: {script or 'No inline content'}")
                 
     except Exception as e:
         print(f"Error analyzing page: {str(e)}")
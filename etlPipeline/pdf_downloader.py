@@ -1,10 +1,8 @@
 import os
 import time
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
 from dotenv import load_dotenv
-from webScraper import login_to_aparavi
+from web_scraper import login_to_aparavi
+from page_extractor import load_manifest, get_manifest_path
 import json
 
 # Load environment variables from root directory
@@ -19,50 +17,58 @@ APARAVI_PASSWORD = os.getenv('APARAVI_PASSWORD')
 if not APARAVI_EMAIL or not APARAVI_PASSWORD:
     raise ValueError("APARAVI_EMAIL or APARAVI_PASSWORD not found in environment variables")
 
-def download_pdf(session, url, output_dir):
+def download_pdf(session, url, pdf_links, output_dir, downloaded=None):
+    """
+    Download the PDFs linked from a crawled page
+
+    Args:
+        session: Logged-in requests session
+        url: Source page the PDF links were found on
+        pdf_links: Absolute PDF URLs taken from the page manifest
+        output_dir: Directory to save the PDFs to
+        downloaded: Optional dict of pdf_url -> filepath already fetched in this run
+    """
     try:
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
+        if downloaded is None:
+            downloaded = {}
         
-        # Get the page content
-        response = session.get(url)
-        soup = BeautifulSoup(response.content, "html.parser")
-        
-        # Look for PDF links in the page
         pdf_mapping = {}  # Dictionary to store PDF file paths and their source URLs
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            if href.endswith('.pdf'):
-                pdf_url = urljoin(url, href)
-                try:
-                    # Extract filename from URL
-                    filename = pdf_url.split('/')[-1]
-                    filepath = os.path.join(output_dir, filename)
-                    
-                    # Download the PDF
-                    print(f"Downloading PDF: {pdf_url}")
-                    pdf_response = session.get(pdf_url, stream=True)
-                    
-                    if pdf_response.ok:
-                        with open(filepath, 'wb') as f:
-                            for chunk in pdf_response.iter_content(chunk_size=8192):
-                                if chunk:
-                                    f.write(chunk)
-                        print(f"Successfully downloaded: {filename}")
-                        # Store the mapping of PDF file to source URL
-                        pdf_mapping[filepath] = {
-                            'source_url': url,
-                            'pdf_url': pdf_url
-                        }
-                    else:
-                        print(f"Failed to download {pdf_url}: Status code {pdf_response.status_code}")
-                    
-                    # Add a small delay to avoid overwhelming the server
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    print(f"Error downloading {pdf_url}: {str(e)}")
-                    continue
+        for pdf_url in pdf_links:
+            # The same PDF is often linked from several pages; fetch it only once
+            if pdf_url in downloaded:
+                continue
+            try:
+                # Extract filename from URL
+                filename = pdf_url.split('/')[-1].split('?')[0]
+                filepath = os.path.join(output_dir, filename)
+                
+                # Download the PDF
+                print(f"Downloading PDF: {pdf_url}")
+                pdf_response = session.get(pdf_url, stream=True)
+                
+                if pdf_response.ok:
+                    with open(filepath, 'wb') as f:
+                        for chunk in pdf_response.iter_content(chunk_size=8192):
+                            if chunk:
+                                f.write(chunk)
+                    print(f"Successfully downloaded: {filename}")
+                    downloaded[pdf_url] = filepath
+                    # Store the mapping of PDF file to source URL
+                    pdf_mapping[filepath] = {
+                        'source_url': url,
+                        'pdf_url': pdf_url
+                    }
+                else:
+                    print(f"Failed to download {pdf_url}: Status code {pdf_response.status_code}")
+                
+                # Add a small delay to avoid overwhelming the server
+                time.sleep(1)
+                
+            except Exception as e:
+                print(f"Error downloading {pdf_url}: {str(e)}")
+                continue
                     
         return pdf_mapping
         
@@ -92,30 +98,23 @@ def main():
     
     print("Successfully logged in. Starting PDF download...")
     
-    # Load URLs from crawled_urls.json in the same directory
-    urls_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crawled_urls.json")
-    try:
-        with open(urls_file, 'r') as f:
-            urls = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: {urls_file} not found. Please run webScraper.py first to generate the URLs file.")
-        return
-    except json.JSONDecodeError:
-        print(f"Error: {urls_file} is not a valid JSON file.")
+    # Load the page manifest written by the crawler; pages are not fetched again here
+    manifest = load_manifest()
+    if manifest is None:
+        print(f"Error: {get_manifest_path()} not found. Please run web_scraper.py first to generate the page manifest.")
         return
     
-    # Process each URL and collect PDF mappings
+    # Process each page that links PDFs and collect PDF mappings
     total_pdfs = 0
     all_pdf_mappings = {}
+    downloaded = {}
+    pages_with_pdfs = [(url, record) for url, record in manifest.items() if record.get('pdf_links')]
     
-    for i, url in enumerate(urls, 1):
-        print(f"\nProcessing URL {i}/{len(urls)}: {url}")
-        pdf_mapping = download_pdf(session, url, output_dir)
+    for i, (url, record) in enumerate(pages_with_pdfs, 1):
+        print(f"\nProcessing URL {i}/{len(pages_with_pdfs)}: {url}")
+        pdf_mapping = download_pdf(session, url, record['pdf_links'], output_dir, downloaded)
         all_pdf_mappings.update(pdf_mapping)
         total_pdfs += len(pdf_mapping)
-        
-        # Add a small delay between pages
-        time.sleep(2)
     
     # Save the PDF source mapping
     save_pdf_mapping(all_pdf_mappings)
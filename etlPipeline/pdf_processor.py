@@ -1,26 +1,123 @@
 from docling.document_converter import DocumentConverter
 import os
+import gc
 import json
 from multiprocessing import Pool
-from typing import Dict, Optional
+from typing import Dict, Iterator, Optional, Tuple
 from datetime import datetime
+from scheduler import MemoryAwareScheduler
+
+# Workers are replaced after this many PDFs so memory fragmentation from docling can't accumulate
+MAX_TASKS_PER_WORKER = 10
+
+def iter_document_texts(document) -> Iterator[Tuple[bool, str]]:
+    """Yield (is_section_header, text) for each text item of a docling document"""
+    for text in document.texts:
+        yield 'section_header' in str(text.label).lower(), text.text
+
+def process_pdf(converter: DocumentConverter, pdf_info: tuple) -> Optional[Dict]:
+    """
+    Process a single PDF file and extract its contents
+    
+    Args:
+        converter: Docling converter to use
+        pdf_info: Tuple of (filepath, source_info)
+        
+    Returns:
+        Dictionary containing processed PDF data or None if processing failed
+    """
+    filepath, source_info = pdf_info
+    try:
+        # Convert the PDF
+        result = converter.convert(filepath)
+        filename = os.path.basename(filepath)
+        document = result.document
+
+        doc_metadata = {
+            'schema_name': document.schema_name,
+            'version': document.version,
+            'name': document.name,
+            'origin': {
+                'mimetype': document.origin.mimetype,
+                'filename': document.origin.filename
+            }
+        }
+
+        # Extract text blocks and sections in a single pass, counting words as we go
+        raw_texts = []
+        sections = []
+        current_section = None
+        word_count = 0
+        for is_header, text in iter_document_texts(document):
+            raw_texts.append(text)
+            word_count += len(text.split())
+            if is_header:
+                current_section = {'header': text, 'content': []}
+                if text:
+                    sections.append(current_section)
+            elif current_section is not None:
+                current_section['content'].append(text)
+
+        # Release the docling document before building the output
+        del document, result
+        gc.collect()
+
+        # Combine all information
+        processed_data = {
+            'filepath': filepath,
+            'source_url': source_info['source_url'],
+            'pdf_url': source_info['pdf_url'],
+            'content': {
+                'full_text': ' '.join(raw_texts),  # Combined for easier processing
+                'sections': sections,
+                'raw_texts': raw_texts  # Original separate text blocks
+            },
+            'metadata': {
+                'filename': filename,
+                'doc_metadata': doc_metadata,
+                'processing_time': datetime.now().isoformat(),
+                'word_count': word_count,
+                'section_count': len(sections)
+            }
+        }
+
+        print(f"Successfully processed: {filename}")
+        return processed_data
+
+    except Exception as e:
+        print(f"Error processing {filepath}: {str(e)}")
+        return None
+
+# Each pool worker builds its converter once, so docling loads its models once per worker
+# rather than once per PDF
+_worker_converter = None
+
+def _init_worker() -> None:
+    global _worker_converter
+    _worker_converter = DocumentConverter()
+
+def _process_pdf_in_worker(pdf_info: tuple) -> Optional[Dict]:
+    return process_pdf(_worker_converter, pdf_info)
 
 class PDFProcessor:
-    def __init__(self, pdf_sources_file: str, output_path: str, num_cores: int = None):
+    def __init__(self, pdf_sources_file: str, output_path: str, num_cores: int = None,
+                 max_tasks_per_worker: int = MAX_TASKS_PER_WORKER):
         """
         Initialize the PDF processor
         
         Args:
             pdf_sources_file: Path to the JSON file containing PDF sources and URLs
             output_path: Path where to save the processed results
-            num_cores: Number of CPU cores to use for processing
+            num_cores: Number of CPU cores to use for processing (derived from CPU and memory limits if not set)
+            max_tasks_per_worker: Number of PDFs a worker process handles before it is replaced
         """
         self.pdf_sources_file = pdf_sources_file
         self.output_path = output_path
-        # Use 75% of available cores by default (18 cores on 24-core system)
-        default_cores = max(1, int(os.cpu_count() * 0.75)) if os.cpu_count() else 1
-        self.num_cores = num_cores if num_cores else default_cores
-        self.converter = DocumentConverter()
+        self.max_tasks_per_worker = max_tasks_per_worker
+        # By default the worker count follows the cgroup CPU quota and available memory
+        self.scheduler = MemoryAwareScheduler(num_workers=num_cores)
+        self.num_cores = self.scheduler.num_workers
+        self.converter = None  # Created on first use; pool workers build their own
         
     def load_pdf_sources(self) -> Dict:
         """Load the PDF sources from the JSON file"""
@@ -32,71 +129,10 @@ class PDFProcessor:
             return {}
 
     def process_single_pdf(self, pdf_info: tuple) -> Optional[Dict]:
-        """
-        Process a single PDF file and extract its contents
-        
-        Args:
-            pdf_info: Tuple of (filepath, source_info)
-            
-        Returns:
-            Dictionary containing processed PDF data or None if processing failed
-        """
-        filepath, source_info = pdf_info
-        try:
-            # Convert the PDF
-            result = self.converter.convert(filepath)
-            filename = os.path.basename(filepath)
-            
-            # Extract text and sections
-            full_texts = [text.text for text in result.document.texts]
-            
-            # Process sections
-            sections = []
-            current_section = {'header': '', 'content': []}
-            for text in result.document.texts:
-                if 'section_header' in str(text.label).lower():
-                    if current_section['header']:
-                        sections.append(current_section.copy())
-                    current_section = {'header': text.text, 'content': []}
-                else:
-                    current_section['content'].append(text.text)
-            
-            if current_section['header']:
-                sections.append(current_section)
-            
-            # Combine all information
-            processed_data = {
-                'filepath': filepath,
-                'source_url': source_info['source_url'],
-                'pdf_url': source_info['pdf_url'],
-                'content': {
-                    'full_text': ' '.join(full_texts),  # Combined for easier processing
-                    'sections': sections,
-                    'raw_texts': full_texts  # Original separate text blocks
-                },
-                'metadata': {
-                    'filename': filename,
-                    'doc_metadata': {
-                        'schema_name': result.document.schema_name,
-                        'version': result.document.version,
-                        'name': result.document.name,
-                        'origin': {
-                            'mimetype': result.document.origin.mimetype,
-                            'filename': result.document.origin.filename
-                        }
-                    },
-                    'processing_time': datetime.now().isoformat(),
-                    'word_count': len(' '.join(full_texts).split()),
-                    'section_count': len(sections)
-                }
-            }
-            
-            print(f"Successfully processed: {filename}")
-            return processed_data
-            
-        except Exception as e:
-            print(f"Error processing {filepath}: {str(e)}")
-            return None
+        """Process a single PDF in this process (see process_pdf)"""
+        if self.converter is None:
+            self.converter = DocumentConverter()
+        return process_pdf(self.converter, pdf_info)
 
     def process_all_pdfs(self) -> None:
         """Process all PDFs and save results to a JSON file"""
@@ -109,16 +145,19 @@ class PDFProcessor:
         # Prepare input for multiprocessing
         pdf_items = list(pdf_sources.items())
         
-        # Process PDFs in parallel
-        with Pool(processes=self.num_cores) as pool:
-            results = pool.map(self.process_single_pdf, pdf_items)
+        # Process PDFs in parallel, largest first and throttled by memory, collecting results as they complete
+        print(f"Processing {len(pdf_items)} PDFs with {self.num_cores} workers")
+        processed_pdfs = {}
+        with Pool(processes=self.num_cores, initializer=_init_worker,
+                  maxtasksperchild=self.max_tasks_per_worker) as pool:
+            for result in self.scheduler.run(pool, _process_pdf_in_worker, pdf_items):
+                # Filter out None results and organize by filepath
+                if result is not None:
+                    processed_pdfs[result['filepath']] = result
         
-        # Filter out None results and organize by filepath
-        processed_pdfs = {
-            result['filepath']: result
-            for result in results
-            if result is not None
-        }
+        # Results arrive in completion order; sort them so the output (and the chunk order,
+        # point ids and dedup representatives derived from it) is the same on every run
+        processed_pdfs = dict(sorted(processed_pdfs.items()))
         
         # Save results
         try:
@@ -0,0 +1,233 @@
+import os
+import re
+import math
+import mmap
+import queue
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Memory model for docling conversions: every worker holds its own layout/table models,
+# and each page adds page images and layout predictions while the document is converted
+BASE_WORKER_MEMORY = 1536 * 1024 * 1024
+PER_PAGE_MEMORY = 24 * 1024 * 1024
+BYTES_PER_PAGE_ESTIMATE = 150 * 1024  # Used when the page count can't be read from the file
+MEMORY_HEADROOM = 0.85  # Share of usable memory the scheduler plans to fill
+LOW_MEMORY_RESERVE = 512 * 1024 * 1024  # Never start a document when less than this is free
+TYPICAL_DOCUMENT_PAGES = 20  # Pages of headroom each worker gets on top of its models
+# A document still running after BASE_TASK_TIMEOUT + pages * PER_PAGE_TIMEOUT seconds is given up on,
+# e.g. because its worker was killed by the OOM killer and the pool will never report it
+BASE_TASK_TIMEOUT = int(os.getenv('PDF_BASE_TASK_TIMEOUT', 600))
+PER_PAGE_TIMEOUT = int(os.getenv('PDF_PER_PAGE_TIMEOUT', 30))
+POLL_INTERVAL = 5  # Seconds between checks for overdue documents
+
+_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+_COUNT_PATTERN = re.compile(rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)", re.S)
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """Get the CPU quota of the current cgroup in cores, or None if unlimited"""
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    cpu_max = _read_first_line('/sys/fs/cgroup/cpu.max')
+    if cpu_max:
+        quota, _, period = cpu_max.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / int(period)
+        return None
+    # cgroup v1
+    quota = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+def available_cpus() -> int:
+    """Get the number of CPUs this process may use, honoring affinity and cgroup quotas"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_limit()
+    if quota:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+def cgroup_memory_limit() -> Optional[int]:
+    """Get the memory limit of the current cgroup in bytes, or None if unlimited"""
+    limit = _read_first_line('/sys/fs/cgroup/memory.max')
+    if limit is None:
+        limit = _read_first_line('/sys/fs/cgroup/memory/memory.limit_in_bytes')
+    if not limit or limit == 'max':
+        return None
+    limit = int(limit)
+    # cgroup v1 reports "unlimited" as a value near the maximum page-aligned int64
+    return limit if limit < (1 << 60) else None
+
+def _cgroup_memory_usage() -> Optional[int]:
+    usage = _read_first_line('/sys/fs/cgroup/memory.current')
+    if usage is None:
+        usage = _read_first_line('/sys/fs/cgroup/memory/memory.usage_in_bytes')
+    return int(usage) if usage else None
+
+def _meminfo_available() -> Optional[int]:
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def available_memory() -> Optional[int]:
+    """Get the memory currently available to this process in bytes, or None if unknown"""
+    candidates = []
+    host_available = _meminfo_available()
+    if host_available is not None:
+        candidates.append(host_available)
+    limit = cgroup_memory_limit()
+    usage = _cgroup_memory_usage()
+    if limit is not None and usage is not None:
+        candidates.append(max(0, limit - usage))
+    return min(candidates) if candidates else None
+
+def count_pdf_pages(filepath: str) -> Optional[int]:
+    """Count the pages of a PDF from its page tree, without parsing it"""
+    try:
+        with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Scanning the mapping leaves paging to the OS instead of reading whole manuals into memory
+            counts = [int(count) for count in _COUNT_PATTERN.findall(data)]
+            if counts:
+                # The root page tree has the largest count
+                return max(counts)
+            # Page objects can be hidden in compressed object streams, in which case this finds nothing
+            pages = sum(1 for _ in _PAGE_PATTERN.finditer(data))
+    except (OSError, ValueError):
+        # ValueError: empty files can't be mapped
+        return None
+    return pages or None
+
+def estimate_pdf_cost(filepath: str) -> Dict:
+    """Estimate the pages and peak conversion memory of a PDF"""
+    try:
+        size = os.path.getsize(filepath)
+    except OSError:
+        size = 0
+    pages = count_pdf_pages(filepath) or max(1, size // BYTES_PER_PAGE_ESTIMATE)
+    return {
+        'pages': pages,
+        'size': size,
+        'memory': pages * PER_PAGE_MEMORY
+    }
+
+class MemoryAwareScheduler:
+    """
+    Run work items on a multiprocessing pool, largest first, within the node's CPU and memory
+
+    The worker count comes from the usable CPUs and the memory left after every worker's
+    fixed footprint. Items are submitted only while the estimated memory of the documents
+    in flight fits the budget and the node still has free memory, so a few huge manuals
+    can't push the job out of memory.
+    """
+
+    def __init__(self, num_workers: Optional[int] = None, memory_budget: Optional[int] = None):
+        known = [value for value in (available_memory(), cgroup_memory_limit()) if value is not None]
+        usable = min(known) if known else None
+        self.memory_budget = memory_budget or (int(usable * MEMORY_HEADROOM) if usable else None)
+
+        cpus = available_cpus()
+        # Leave room for at least a typical document per worker on top of its models
+        per_worker = BASE_WORKER_MEMORY + TYPICAL_DOCUMENT_PAGES * PER_PAGE_MEMORY
+        memory_workers = max(1, self.memory_budget // per_worker) if self.memory_budget else None
+        if num_workers:
+            self.num_workers = num_workers
+            if memory_workers is not None and num_workers > memory_workers:
+                # More workers than fit would leave no memory for documents, so only one would run at a time
+                print(f"Reducing workers from {num_workers} to {memory_workers} to fit the memory budget of "
+                      f"{self.memory_budget // (1024 * 1024)} MiB")
+                self.num_workers = memory_workers
+        elif memory_workers is not None:
+            self.num_workers = min(cpus, memory_workers)
+        else:
+            self.num_workers = cpus
+
+    def plan(self, items: List[Tuple[str, Dict]]) -> List[Tuple[Tuple[str, Dict], Dict]]:
+        """Attach a cost estimate to each (filepath, source_info) item and order them largest first"""
+        planned = [(item, estimate_pdf_cost(item[0])) for item in items]
+        planned.sort(key=lambda entry: (entry[1]['pages'], entry[1]['size']), reverse=True)
+        return planned
+
+    def _documents_budget(self) -> Optional[int]:
+        if self.memory_budget is None:
+            return None
+        return max(0, self.memory_budget - self.num_workers * BASE_WORKER_MEMORY)
+
+    def _can_start(self, cost: Dict, in_flight_memory: int, in_flight_count: int) -> bool:
+        if in_flight_count == 0:
+            # Always keep one document going, however large
+            return True
+        if in_flight_count >= self.num_workers:
+            return False
+        budget = self._documents_budget()
+        if budget is not None and in_flight_memory + cost['memory'] > budget:
+            return False
+        free = available_memory()
+        return free is None or free - cost['memory'] >= LOW_MEMORY_RESERVE
+
+    def run(self, pool, func: Callable, items: List[Tuple[str, Dict]]) -> Iterator:
+        """
+        Submit items to the pool as memory allows and yield results as they complete
+
+        Failed items and items still running past their timeout (e.g. because the OOM killer
+        took their worker, which the pool never reports) yield None. An overdue item's memory
+        stays charged until its late result or error arrives, since its worker may still be
+        converting it; a late result is dropped.
+        """
+        pending = self.plan(items)
+        pending.reverse()  # Pop from the end, largest first
+        completed = queue.Queue()
+        in_flight = {}  # task id -> (item, cost, deadline)
+        overdue = {}  # task id -> cost, for tasks given up on whose worker may still be running
+        in_flight_memory = 0
+        next_task = 0
+
+        def submit(task, item, cost):
+            def on_error(error):
+                print(f"Error processing {item[0]}: {error}")
+                completed.put((task, None))
+
+            pool.apply_async(func, (item,), callback=lambda result: completed.put((task, result)),
+                             error_callback=on_error)
+
+        while pending or in_flight:
+            while pending and self._can_start(pending[-1][1], in_flight_memory, len(in_flight)):
+                item, cost = pending.pop()
+                deadline = time.monotonic() + BASE_TASK_TIMEOUT + cost['pages'] * PER_PAGE_TIMEOUT
+                in_flight[next_task] = (item, cost, deadline)
+                submit(next_task, item, cost)
+                in_flight_memory += cost['memory']
+                next_task += 1
+
+            try:
+                task, result = completed.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                now = time.monotonic()
+                for task in [task for task, (_, _, deadline) in in_flight.items() if deadline < now]:
+                    item, cost, _ = in_flight.pop(task)
+                    print(f"Giving up on {item[0]}: no result within its timeout")
+                    overdue[task] = cost
+                    yield None
+                continue
+
+            if task in overdue:
+                # The worker was only slow; its memory is free now, but the item was already reported
+                in_flight_memory -= overdue.pop(task)['memory']
+                continue
+            _, cost, _ = in_flight.pop(task)
+            in_flight_memory -= cost['memory']
+            yield result
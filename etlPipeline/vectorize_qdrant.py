@@ -1,13 +1,18 @@
 import json
 import os
+import argparse
 from typing import Dict, List, Optional
-from openai import OpenAI
+import numpy as np
 from qdrant_client import QdrantClient, models
 from qdrant_client.http import models as rest
 from qdrant_client.http.models import Distance, VectorParams
 import tiktoken
 from tqdm import tqdm
 from dotenv import load_dotenv
+from embeddings import get_embedding_backend
+from dedup import deduplicate_chunks
+from chunk_store import (chunks_to_table, with_embeddings, embedding_matrix, embedding_model_of,
+                         reuse_embeddings, read_chunk_store, write_chunk_store)
 
 # Load environment variables
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
@@ -17,15 +22,15 @@ load_dotenv(env_path)
 
 # Constants
 COLLECTION_NAME = os.getenv('COLLECTION_NAME', 'AparaviDocs')
-OPENAI_MODEL = "text-embedding-3-small"
-MAX_TOKENS = 8191  # OpenAI's embedding model token limit
+OPENAI_MODEL = "text-embedding-3-small"  # Tokenizer used to measure chunk sizes
 BATCH_SIZE = 100
-VECTOR_SIZE = 1536  # text-embedding-3-small dimension size
 
-# Initialize OpenAI client
-openaiClient = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Initialize the embedding backend (EMBEDDING_BACKEND=openai|onnx)
+embedding_backend = get_embedding_backend()
+MAX_TOKENS = embedding_backend.max_tokens
+VECTOR_SIZE = embedding_backend.dimension
 
-def init_qdrant_client() -> QdrantClient:
+def init_qdrant_client(collection_name: str = COLLECTION_NAME, vector_size: int = VECTOR_SIZE) -> QdrantClient:
     """Initialize Qdrant client and create collection if it doesn't exist"""
     qdrant_url = os.getenv('QDRANT_URL')
     qdrant_api_key = os.getenv('QDRANT_API_KEY')
@@ -40,17 +45,17 @@ def init_qdrant_client() -> QdrantClient:
     
     # Delete existing collection if it exists
     try:
-        client.delete_collection(COLLECTION_NAME)
-        print(f"Deleted existing collection: {COLLECTION_NAME}")
+        client.delete_collection(collection_name)
+        print(f"Deleted existing collection: {collection_name}")
     except Exception as e:
-        print(f"Collection {COLLECTION_NAME} does not exist yet")
+        print(f"Collection {collection_name} does not exist yet")
     
     # Create collection with correct vector size
     client.create_collection(
-        collection_name=COLLECTION_NAME,
-        vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE),
+        collection_name=collection_name,
+        vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
     )
-    print(f"Created collection {COLLECTION_NAME} with vector size {VECTOR_SIZE}")
+    print(f"Created collection {collection_name} with vector size {vector_size}")
     
     return client
 
@@ -63,6 +68,13 @@ def get_word_count(text: str) -> int:
     """Get the number of words in a text string"""
     return len(text.split())
 
+def split_long_text(text: str, max_tokens: int = MAX_TOKENS) -> List[str]:
+    """Split a text that exceeds the token limit into consecutive token windows"""
+    encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
+    tokens = encoding.encode(text)
+    pieces = [encoding.decode(tokens[i:i + max_tokens]).strip() for i in range(0, len(tokens), max_tokens)]
+    return [piece for piece in pieces if piece]
+
 def chunk_text(text: str, max_tokens: int = MAX_TOKENS) -> List[str]:
     """Split text into chunks that fit within token limit"""
     chunks = []
@@ -73,13 +85,20 @@ def chunk_text(text: str, max_tokens: int = MAX_TOKENS) -> List[str]:
     sentences = text.split(". ")
     
     for sentence in sentences:
+        sentence = sentence.strip()
+        if not sentence:
+            continue
         sentence_tokens = get_token_count(sentence)
         
-        if current_length + sentence_tokens > max_tokens:
+        if current_length + sentence_tokens > max_tokens and current_chunk:
             # Save current chunk and start new one
             chunks.append(". ".join(current_chunk) + ".")
-            current_chunk = [sentence]
-            current_length = sentence_tokens
+            current_chunk = []
+            current_length = 0
+        
+        if sentence_tokens > max_tokens:
+            # A sentence (or a text block without ". ") longer than the limit is split on its own
+            chunks.extend(split_long_text(sentence, max_tokens))
         else:
             current_chunk.append(sentence)
             current_length += sentence_tokens
@@ -90,14 +109,10 @@ def chunk_text(text: str, max_tokens: int = MAX_TOKENS) -> List[str]:
     
     return chunks
 
-def get_embeddings(texts: List[str]) -> List[List[float]]:
-    """Get embeddings for a list of texts using OpenAI's API"""
+def get_embeddings(texts: List[str]) -> np.ndarray:
+    """Get embeddings for a list of texts using the configured embedding backend"""
     try:
-        response = openaiClient.embeddings.create(
-            model=OPENAI_MODEL,
-            input=texts
-        )
-        return [data.embedding for data in response.data]
+        return embedding_backend.embed(texts)
     except Exception as e:
         print(f"Error getting embeddings: {e}")
         return []
@@ -107,7 +122,7 @@ def process_pdf_content(pdf_data: Dict) -> List[Dict]:
     chunks = []
     
     # Extract metadata
-    filename = os.path.basename(pdf_data["filepath"])
+    filename = pdf_data["metadata"].get("filename") or os.path.basename(pdf_data["filepath"])
     total_sections = len(pdf_data["content"]["sections"])
     total_words = get_word_count(pdf_data["content"]["full_text"])
     
@@ -119,7 +134,9 @@ def process_pdf_content(pdf_data: Dict) -> List[Dict]:
         "total_sections": total_sections,
         "total_words": total_words,
         "doc_metadata": pdf_data["metadata"]["doc_metadata"],
-        "processing_time": pdf_data["metadata"]["processing_time"]
+        "processing_time": pdf_data["metadata"]["processing_time"],
+        "content_type": pdf_data["metadata"].get("content_type", "pdf"),
+        "video_urls": pdf_data["metadata"].get("video_urls", [])
     }
     
     # Process full text into chunks
@@ -164,12 +181,12 @@ def process_pdf_content(pdf_data: Dict) -> List[Dict]:
     
     return chunks
 
-def main():
-    # Initialize Qdrant client
-    client = init_qdrant_client()
-    
-    # Load processed PDFs
-    current_dir = os.path.dirname(os.path.abspath(__file__))
+def process_page_content(page_data: Dict) -> List[Dict]:
+    """Process a single academy page's content; pages share the processed-PDF shape and chunk schema"""
+    return process_pdf_content(page_data)
+
+def build_chunks(current_dir: str) -> List[Dict]:
+    """Chunk all processed PDFs and academy pages"""
     pdf_file = os.path.join(current_dir, "processed_pdfs.json")
     
     with open(pdf_file, 'r', encoding='utf-8') as f:
@@ -181,35 +198,102 @@ def main():
         chunks = process_pdf_content(pdf_info)
         all_chunks.extend(chunks)
     
-    print(f"Total chunks to process: {len(all_chunks)}")
+    # Add the academy pages' text if html_processor.py has been run
+    pages_file = os.path.join(current_dir, "processed_pages.json")
+    if os.path.exists(pages_file):
+        with open(pages_file, 'r', encoding='utf-8') as f:
+            page_data = json.load(f)
+        for url, page_info in tqdm(page_data["processed_pages"].items(), desc="Processing pages"):
+            all_chunks.extend(process_page_content(page_info))
+    
+    return all_chunks
+
+def embed_chunk_table(table, previous=None):
+    """Embed the chunks in a table, reusing embeddings of unchanged chunks from a previous store"""
+    missing, matrix = reuse_embeddings(table, previous, embedding_backend.name)
+    missing_rows = np.flatnonzero(missing)
+    print(f"Reusing {table.num_rows - len(missing_rows)} stored embeddings, embedding {len(missing_rows)} chunks")
     
-    # Process chunks in batches
-    for i in tqdm(range(0, len(all_chunks), BATCH_SIZE), desc="Vectorizing chunks"):
-        batch = all_chunks[i:i + BATCH_SIZE]
+    if matrix is None:
+        matrix = np.zeros((table.num_rows, VECTOR_SIZE), dtype=np.float32)
+    embedded = ~missing
+    
+    texts = table.column("text")
+    for i in tqdm(range(0, len(missing_rows), BATCH_SIZE), desc="Vectorizing chunks"):
+        rows = missing_rows[i:i + BATCH_SIZE]
+        embeddings = get_embeddings([texts[int(row)].as_py() for row in rows])
+        if len(embeddings):
+            matrix[rows] = np.asarray(embeddings, dtype=np.float32)
+            embedded[rows] = True
+    
+    # Chunks whose embedding call failed are dropped rather than indexed with zero vectors
+    if not embedded.all():
+        print(f"Warning: {int((~embedded).sum())} chunks could not be embedded and are left out")
+        keep = np.flatnonzero(embedded)
+        table, matrix = table.take(keep), matrix[keep]
+    return with_embeddings(table, matrix, embedding_backend.name)
+
+def index_chunk_table(client: QdrantClient, table, collection_name: str = COLLECTION_NAME) -> None:
+    """Upload the chunks and embeddings of a chunk table to Qdrant"""
+    matrix = embedding_matrix(table)
+    texts = table.column("text")
+    metadata = table.column("metadata")
+    
+    for i in tqdm(range(0, table.num_rows, BATCH_SIZE), desc="Indexing chunks"):
+        end = min(i + BATCH_SIZE, table.num_rows)
+        points = [
+            models.PointStruct(
+                id=row,
+                vector=matrix[row].tolist(),
+                payload={
+                    "text": texts[row].as_py(),
+                    **json.loads(metadata[row].as_py())
+                }
+            )
+            for row in range(i, end)
+        ]
         
-        # Get embeddings for the batch
-        texts = [chunk["text"] for chunk in batch]
-        embeddings = get_embeddings(texts)
+        # Upload to Qdrant
+        client.upsert(
+            collection_name=collection_name,
+            points=points
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk, embed and index the processed documents")
+    parser.add_argument("--from-store", action="store_true",
+                        help="Re-index the existing chunk store without chunking or embedding")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="Qdrant collection to index into")
+    parser.add_argument("--no-dedup", action="store_true", help="Embed near-duplicate chunks separately")
+    args = parser.parse_args()
+    
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    previous = read_chunk_store()
+    
+    if args.from_store:
+        if previous is None or embedding_matrix(previous) is None:
+            print("No embedded chunk store found. Please run vectorize_qdrant.py without --from-store first.")
+            return
+        if embedding_model_of(previous) != embedding_backend.name:
+            print(f"Chunk store was embedded with {embedding_model_of(previous)}, but the configured "
+                  f"backend is {embedding_backend.name}; queries would not match the index.")
+            return
+        table = previous
+    else:
+        all_chunks = build_chunks(current_dir)
+        # Boilerplate repeated across documents is merged before it costs embedding calls
+        if not args.no_dedup:
+            all_chunks = deduplicate_chunks(all_chunks)
+        print(f"Total chunks to process: {len(all_chunks)}")
         
-        if embeddings:
-            # Prepare points for Qdrant
-            points = [
-                models.PointStruct(
-                    id=i + idx,
-                    vector=embedding,
-                    payload={
-                        "text": chunk["text"],
-                        **chunk["metadata"]
-                    }
-                )
-                for idx, (chunk, embedding) in enumerate(zip(batch, embeddings))
-            ]
-            
-            # Upload to Qdrant
-            client.upsert(
-                collection_name=COLLECTION_NAME,
-                points=points
-            )
+        # The chunk store is the hand-off between chunking, embedding and indexing
+        table = embed_chunk_table(chunks_to_table(all_chunks), previous)
+        del all_chunks
+        write_chunk_store(table)
+    
+    # Initialize Qdrant client
+    client = init_qdrant_client(args.collection, embedding_matrix(table).shape[1])
+    index_chunk_table(client, table, args.collection)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
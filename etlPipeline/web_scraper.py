@@ -1,9 +1,12 @@
 import os
 import json
+import heapq
+import hashlib
+from array import array
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from dotenv import load_dotenv
+from page_extractor import extract_page, save_manifest
 
 # Load environment variables from root directory
 root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -17,6 +20,160 @@ APARAVI_PASSWORD = os.getenv('APARAVI_PASSWORD')
 if not APARAVI_EMAIL or not APARAVI_PASSWORD:
     raise ValueError("APARAVI_EMAIL or APARAVI_PASSWORD not found in environment variables")
 
+# Crawl limits
+MAX_CRAWL_DEPTH = int(os.getenv('MAX_CRAWL_DEPTH', 8))
+MAX_CRAWL_PAGES = int(os.getenv('MAX_CRAWL_PAGES', 5000))
+
+# Tracking query parameters, which never change the page content
+IGNORED_QUERY_PARAMS = {'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+                        'fbclid', 'gclid'}
+
+# URL keywords that indicate valuable content, with their priority bonus
+PRIORITY_KEYWORDS = {
+    'pdf': 6,
+    'download': 4,
+    'course': 5,
+    'lesson': 5,
+    'training': 4,
+    'tutorial': 4,
+    'video': 4,
+    'documentation': 3,
+    'guide': 3,
+}
+# Fetched pages are kept here so later stages never refetch them
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crawled_pages")
+
+# Bonus for links found on pages that already offer PDFs or videos
+CONTENT_PAGE_BONUS = 3
+
+def canonicalize_url(url):
+    """Normalize a URL so that variants of the same logical page compare equal.
+
+    Lowercases scheme and host, drops fragments and default ports, removes
+    tracking query parameters, sorts the remaining ones and strips trailing slashes.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == 'https' and netloc.endswith(':443')) or (scheme == 'http' and netloc.endswith(':80')):
+        netloc = netloc.rsplit(':', 1)[0]
+
+    path = parts.path or '/'
+    while '//' in path:
+        path = path.replace('//', '/')
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    query_params = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                    if key.lower() not in IGNORED_QUERY_PARAMS]
+    query = urlencode(sorted(query_params))
+
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+def is_allowed_url(url):
+    """Check if the URL is within the allowed domain and is an English page"""
+    return url.startswith("https://aparavi-academy.eu") and ("/en/" in url or url.endswith("/en"))
+
+def score_url(url, depth=0):
+    """Compute the crawl priority of a URL (higher is crawled first)"""
+    lowered = url.lower()
+    score = sum(bonus for keyword, bonus in PRIORITY_KEYWORDS.items() if keyword in lowered)
+    # Prefer shallow pages among equally valuable ones
+    return score - depth
+
+class DigestSet:
+    """Set of 64-bit URL digests packed into an open-addressing table.
+
+    Slots are a flat array of unsigned 64-bit ints (0 marks an empty slot) kept at most
+    half full, so each entry costs about 16 bytes instead of the ~70 bytes of an int in
+    a Python set.
+    """
+
+    def __init__(self, capacity=1024):
+        self._slots = array('Q', bytes(8 * capacity))
+        self._size = 0
+
+    def _probe(self, digest):
+        mask = len(self._slots) - 1
+        index = digest & mask
+        while self._slots[index] and self._slots[index] != digest:
+            index = (index + 1) & mask
+        return index
+
+    def add(self, digest):
+        """Add a digest; returns False if it was already present"""
+        digest = digest or 1  # 0 is reserved for empty slots
+        index = self._probe(digest)
+        if self._slots[index]:
+            return False
+        self._slots[index] = digest
+        self._size += 1
+        if self._size * 2 > len(self._slots):
+            old_slots = self._slots
+            self._slots = array('Q', bytes(16 * len(old_slots)))
+            for value in old_slots:
+                if value:
+                    self._slots[self._probe(value)] = value
+        return True
+
+    def __contains__(self, digest):
+        return bool(self._slots[self._probe(digest or 1)])
+
+    def __len__(self):
+        return self._size
+
+class CrawlFrontier:
+    """Priority queue of URLs to crawl backed by a compact visited set.
+
+    Visited URLs are stored as 64-bit digests of their canonical form in a DigestSet
+    rather than as full strings, so the set stays small for large crawls.
+    """
+
+    def __init__(self, max_depth=MAX_CRAWL_DEPTH, max_pages=MAX_CRAWL_PAGES):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self._heap = []
+        self._seen = DigestSet()
+        self._counter = 0
+        self.pages_crawled = 0
+
+    @staticmethod
+    def _digest(url):
+        return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def add(self, url, depth=0, priority=None):
+        """Queue a URL unless it was already seen or exceeds the depth limit"""
+        if depth > self.max_depth:
+            return False
+        url = canonicalize_url(url)
+        if not self._seen.add(self._digest(url)):
+            return False
+        if priority is None:
+            priority = score_url(url, depth)
+        # heapq is a min-heap, so negate the priority; the counter keeps FIFO order for ties
+        heapq.heappush(self._heap, (-priority, self._counter, depth, url))
+        self._counter += 1
+        return True
+
+    def pop(self):
+        """Return the next (url, depth) to crawl, or None if done or out of budget"""
+        if not self._heap or self.pages_crawled >= self.max_pages:
+            return None
+        _, _, depth, url = heapq.heappop(self._heap)
+        self.pages_crawled += 1
+        return url, depth
+
+    def __len__(self):
+        return len(self._heap)
+
+def save_page_html(url, content, pages_dir=PAGES_DIR):
+    """Store a fetched page under a filename derived from its URL and return that filename"""
+    os.makedirs(pages_dir, exist_ok=True)
+    filename = hashlib.sha1(url.encode('utf-8')).hexdigest() + '.html'
+    with open(os.path.join(pages_dir, filename), 'wb') as f:
+        f.write(content)
+    return filename
+
 def login_to_aparavi():
     session = requests.Session()
     login_url = "https://aparavi-academy.eu/en/login"
@@ -45,27 +202,48 @@ def login_to_aparavi():
         return None
 
 def crawl_page(session, url):
+    """
+    Fetch a page once and extract everything the pipeline needs from it
+
+    Returns:
+        Page record from page_extractor.extract_page with outlinks restricted to
+        canonical, crawlable English academy pages, or None if the page failed
+        or is not an HTML page
+    """
     try:
         # Check if the URL is within the allowed domain and is an English page
-        if not url.startswith("https://aparavi-academy.eu") or not ("/en/" in url or url.endswith("/en")):
-            return []
+        if not is_allowed_url(url):
+            return None
             
         response = session.get(url, timeout=10)  # Added timeout
         if not response.ok:
             print(f"Failed to fetch {url}: Status code {response.status_code}")
-            return []
+            return None
             
-        soup = BeautifulSoup(response.content, "html.parser")
+        # Download endpoints under /en/ can serve PDFs, images or archives; only parse real pages
+        content_type = response.headers.get('Content-Type', '')
+        if not content_type.lower().startswith('text/html'):
+            print(f"Skipping {url}: not an HTML page ({content_type or 'no Content-Type'})")
+            return None
+            
+        record = extract_page(response.content, url)
+        try:
+            record['html_file'] = save_page_html(url, response.content)
+        except OSError as e:
+            print(f"Warning: Could not save page content for {url}: {e}")
         links = []
-        for link in soup.find_all("a", href=True):
-            next_url = urljoin(url, link["href"])
+        seen = set()
+        for link in record['outlinks']:
+            next_url = canonicalize_url(link)
             # Only add URLs that are within the allowed domain and are English pages
-            if next_url.startswith("https://aparavi-academy.eu") and ("/en/" in next_url or next_url.endswith("/en")):
+            if is_allowed_url(next_url) and next_url not in seen:
+                seen.add(next_url)
                 links.append(next_url)
-        return links
+        record['outlinks'] = links
+        return record
     except requests.exceptions.RequestException as e:
         print(f"Error crawling {url}: {e}")
-        return []
+        return None
 
 def save_urls_to_file(urls, filename='crawled_urls.json'):
     """Safely save URLs to a JSON file with error handling."""
@@ -111,28 +289,42 @@ def main():
         return
 
     try:
-        visited_urls = set()
-        urls_to_visit = [base_url]
+        visited_urls = []
+        manifest = {}
+        frontier = CrawlFrontier()
+        frontier.add(base_url)
 
-        while urls_to_visit:
+        while True:
+            next_item = frontier.pop()
+            if next_item is None:
+                break
+            current_url, depth = next_item
             try:
-                current_url = urls_to_visit.pop(0)
-                if current_url not in visited_urls:
-                    print(f"Crawling: {current_url}")
-                    new_links = crawl_page(session, current_url)
-                    visited_urls.add(current_url)
-                    # Only add new URLs that haven't been visited
-                    urls_to_visit.extend([url for url in new_links if url not in visited_urls])
+                print(f"Crawling (depth {depth}, queued {len(frontier)}): {current_url}")
+                record = crawl_page(session, current_url)
+                visited_urls.append(current_url)
+                if record is None:
+                    continue
+                manifest[current_url] = record
+                # Pages next to PDFs or videos are likely to hold more of them
+                bonus = CONTENT_PAGE_BONUS if record['pdf_links'] or record['videos'] else 0
+                # The frontier skips URLs that were already queued or visited
+                for url in record['outlinks']:
+                    frontier.add(url, depth + 1, score_url(url, depth + 1) + bonus)
             except Exception as e:
                 print(f"Error processing URL {current_url}: {e}")
                 continue
 
+        if frontier.pages_crawled >= frontier.max_pages and len(frontier):
+            print(f"Page budget of {frontier.max_pages} reached, {len(frontier)} URLs left unvisited.")
+
         print("Crawling finished.")
         print(f"Total pages crawled: {len(visited_urls)}")
         
         # Save the results
         if visited_urls:
             save_urls_to_file(visited_urls)
+            save_manifest(manifest)
         else:
             print("No URLs were crawled, skipping file save")
 
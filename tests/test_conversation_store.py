@@ -0,0 +1,108 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation_store import InMemoryConversationStore, SQLiteConversationStore
+
+
+def messages(count, start=0):
+    return [{'role': 'user' if i % 2 == 0 else 'assistant', 'content': f'message {i}'}
+            for i in range(start, start + count)]
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(summarizer):
+        if request.param == 'memory':
+            return InMemoryConversationStore(summarizer)
+        return SQLiteConversationStore(str(tmp_path / 'conversations.db'), summarizer)
+    return make
+
+
+def fill(store, history):
+    for message in history:
+        store.append('session', message)
+
+
+def test_compact_folds_oldest_messages_into_summary(make_store):
+    summarized = []
+
+    def summarizer(summary, older):
+        summarized.append(older)
+        return f'{len(older)} messages'
+
+    store = make_store(summarizer)
+    history = messages(14)
+    fill(store, history)
+    store.compact('session')
+
+    conversation = store.load('session')
+    assert summarized == [history[:8]]
+    assert conversation == {'summary': '8 messages', 'messages': history[8:]}
+    assert store.prompt_messages('session')[0]['role'] == 'system'
+
+
+def test_compact_keeps_verbatim_history_starting_with_user_turn(make_store):
+    store = make_store(lambda summary, older: 'summary')
+    history = messages(15)
+    fill(store, history)
+    store.compact('session')
+
+    # The cut at 9 would start with an assistant reply, so it moves to the next user message
+    assert store.load('session') == {'summary': 'summary', 'messages': history[10:]}
+
+
+def test_compact_drops_messages_when_summarizer_fails(make_store):
+    def summarizer(summary, older):
+        raise RuntimeError('model unavailable')
+
+    store = make_store(summarizer)
+    history = messages(14)
+    fill(store, history)
+    store.compact('session')
+
+    assert store.load('session') == {'summary': '', 'messages': history[8:]}
+
+
+def test_compact_does_nothing_below_limit(make_store):
+    store = make_store(lambda summary, older: pytest.fail('summarizer called'))
+    history = messages(12)
+    fill(store, history)
+    store.compact('session')
+
+    assert store.load('session') == {'summary': '', 'messages': history}
+
+
+def test_compact_keeps_messages_appended_while_summarizing(make_store):
+    store = None
+
+    def summarizer(summary, older):
+        store.append('session', {'role': 'user', 'content': 'from another tab'})
+        return 'summary'
+
+    store = make_store(summarizer)
+    history = messages(14)
+    fill(store, history)
+    store.compact('session')
+
+    assert store.load('session') == {
+        'summary': 'summary',
+        'messages': history[8:] + [{'role': 'user', 'content': 'from another tab'}]
+    }
+
+
+def test_compact_does_not_restore_cleared_session(make_store):
+    store = None
+
+    def summarizer(summary, older):
+        store.clear('session')
+        return 'summary'
+
+    store = make_store(summarizer)
+    fill(store, messages(14))
+    store.compact('session')
+
+    assert store.load('session') == {'summary': '', 'messages': []}
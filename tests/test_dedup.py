@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'etlPipeline'))
+
+from dedup import deduplicate_chunks
+
+BOILERPLATE = ("Aparavi and the Aparavi logo are trademarks of Aparavi Software. All other trademarks are "
+               "the property of their respective owners. This document is provided for information purposes "
+               "only and its contents are subject to change without notice.")
+
+
+def chunk(text, filename, chunk_type, **metadata):
+    return {'text': text, 'metadata': {'source_url': 'https://aparavi.com/docs', 'pdf_url': f'https://aparavi.com/{filename}',
+                                       'filename': filename, 'chunk_type': chunk_type, **metadata}}
+
+
+def test_boilerplate_across_documents_is_merged():
+    chunks = [chunk(BOILERPLATE, 'install.pdf', 'section', section_header='Legal'),
+              chunk(BOILERPLATE, 'upgrade.pdf', 'section', section_header='Legal')]
+    deduplicated = deduplicate_chunks(chunks)
+    assert len(deduplicated) == 1
+    assert deduplicated[0]['metadata']['duplicate_count'] == 2
+    assert [source['filename'] for source in deduplicated[0]['metadata']['source_documents']] == \
+        ['install.pdf', 'upgrade.pdf']
+
+
+def test_section_chunk_of_short_document_survives():
+    body = ("Run the installer as an administrator, choose the platform address and enter the activation "
+            "key that was sent to you by email, then restart the service to finish the setup")
+    chunks = [chunk(f"Install the Agent {body}", 'install.pdf', 'full_text', chunk_index=0),
+              chunk(f"Install the Agent: {body}", 'install.pdf', 'section', section_header='Install the Agent',
+                    section_index=0, chunk_index=0)]
+    deduplicated = deduplicate_chunks(chunks)
+    assert [c['metadata']['chunk_type'] for c in deduplicated] == ['full_text', 'section']
+    assert deduplicated[1]['metadata']['section_header'] == 'Install the Agent'
+    assert all(c['metadata']['duplicate_count'] == 1 for c in deduplicated)
@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'etlPipeline'))
+
+from html_processor import HTMLProcessor
+
+
+def extract(html):
+    return HTMLProcessor('', '', '').extract_sections(html.encode('utf-8'))
+
+
+def test_layout_wrapper_class_names_are_kept():
+    sections = extract('<html><body><div class="page-wrapper has-sidebar">'
+                       '<h1>Title</h1><p>Body content</p></div></body></html>')
+    assert sections == [{'header': 'Title', 'content': ['Body content']}]
+
+
+def test_layout_wrapper_ids_are_kept():
+    sections = extract('<html><body><div id="main-navigation-layout">'
+                       '<h2>Setup</h2><p>Install the agent.</p></div></body></html>')
+    assert sections == [{'header': 'Setup', 'content': ['Install the agent.']}]
+
+
+def test_chrome_is_stripped():
+    sections = extract('<html><body><nav>Home | Courses</nav><div class="cookie-banner">We use cookies</div>'
+                       '<div class="sidebar">Related links</div><div role="navigation">Next page</div>'
+                       '<main><h1>Install the Agent</h1><p>Run the installer and follow the steps.</p></main>'
+                       '<footer>Legal notice</footer></body></html>')
+    assert sections == [{'header': 'Install the Agent', 'content': ['Run the installer and follow the steps.']}]
+
+
+def test_chrome_wrapper_holding_the_page_is_kept():
+    # Some CMSs wrap the whole page in a <form> or a "menu" container
+    sections = extract('<html><body><form class="menu"><h1>Title</h1>'
+                       '<p>All of the page content lives here.</p></form></body></html>')
+    assert sections == [{'header': 'Title', 'content': ['All of the page content lives here.']}]
+
+
+def test_unchanged_html_is_not_parsed_again(tmp_path, monkeypatch):
+    (tmp_path / 'page.html').write_bytes(b'<html><body><h1>Title</h1><p>Body</p></body></html>')
+    processor = HTMLProcessor('', str(tmp_path), '')
+    record = {'html_file': 'page.html', 'videos': []}
+    first = processor.process_single_page('https://example/en/page', record)
+
+    def fail(content):
+        raise AssertionError('page was parsed again')
+
+    monkeypatch.setattr(processor, 'extract_sections', fail)
+    assert processor.process_single_page('https://example/en/page', record, first) is first
@@ -3,7 +3,12 @@ import streamlit as st
 from PIL import Image
 from qdrant_client import QdrantClient, models
 import os
+import re
+import time
+import uuid
 from dotenv import load_dotenv
+from etlPipeline.embeddings import get_embedding_backend
+from conversation_store import get_conversation_store
 
 # Load environment variables
 root_dir = os.path.dirname(os.path.abspath(__file__))
@@ -27,12 +32,52 @@ st.markdown("<h1 style='text-align: center;'>Aparavi Customer Support Agent</h1>
 # initialize the retriever and the embedding model
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
+@st.cache_resource
+def load_embedding_backend():
+    """Load the embedding backend once per server process; must match the one used for indexing"""
+    return get_embedding_backend()
+
+embedding_backend = load_embedding_backend()
+
 # Initialize session state variables
 if "openai_model" not in st.session_state:
     st.session_state["openai_model"] = "gpt-4"
 
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+def summarize_conversation(summary, messages):
+    """Fold older messages into the rolling conversation summary"""
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    response = client.chat.completions.create(
+        model=os.getenv('SUMMARY_MODEL', 'gpt-4o-mini'),
+        messages=[{
+            "role": "user",
+            "content": f"""Update the summary of this Aparavi customer support conversation.
+            Keep the user's setup, the problems raised, the solutions and links already given, and open questions.
+            Answer with the summary only, in at most 200 words.
+
+            CURRENT SUMMARY:
+            {summary or "(none)"}
+
+            NEW MESSAGES:
+            {transcript}
+            """
+        }],
+    )
+    return response.choices[0].message.content.strip()
+
+@st.cache_resource
+def load_conversation_store():
+    """Share one conversation store between all sessions of this server process"""
+    return get_conversation_store(summarize_conversation)
+
+conversation_store = load_conversation_store()
+
+# The session id is kept server-side only: anyone holding it could read the conversation,
+# so it is never put in the URL where it would end up in shared links and browser history.
+# As a result a conversation lasts only as long as the browser session: a reload or restart starts a new one
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+    conversation_store.expire()
+session_id = st.session_state["session_id"]
 
 # Initialize the sidebar
 with st.sidebar:
@@ -40,7 +85,66 @@ with st.sidebar:
 
     # Button to clear current chat
     if st.button("Clear Chat"):
-        st.session_state.messages = []
+        conversation_store.clear(session_id)
+
+# A blank line followed by a complete line that starts flush left and isn't a list item,
+# quote, indented continuation or indented code block
+PARAGRAPH_BREAK = re.compile(r"\n\n(?=[^\s>])(?![-*+][ \t]|\d+[.)][ \t])(?=[^\n]*\n)")
+
+class StreamRenderer:
+    """Render a streamed response in time/size-based flushes instead of once per token.
+
+    Completed paragraphs are frozen into their own markdown element, so each flush
+    only re-renders the paragraph that is still growing. Once the stream ends, the
+    whole answer is rendered as one element so it looks the same as it does in the history.
+    """
+
+    def __init__(self, container, flush_interval=0.1, flush_chars=256):
+        self.container = container
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self.placeholder = container.empty()
+        self.frozen = []  # Placeholders of the paragraphs already frozen
+        self.parts = []  # Everything received, joined once at the end
+        self.tail = []  # Deltas of the paragraph that is still being rendered
+        self.pending_chars = 0
+        self.last_flush = time.monotonic()
+
+    def write(self, delta):
+        if not delta:
+            return
+        self.parts.append(delta)
+        self.tail.append(delta)
+        self.pending_chars += len(delta)
+        if self.pending_chars >= self.flush_chars or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        tail = "".join(self.tail)
+        # Freeze finished paragraphs, but never split inside a code block or a list
+        boundary = -1
+        for match in PARAGRAPH_BREAK.finditer(tail):
+            if match.start() > 0 and tail[:match.start()].count("```") % 2 == 0:
+                boundary = match.start()
+        if boundary > 0:
+            self.placeholder.markdown(tail[:boundary])
+            self.frozen.append(self.placeholder)
+            self.placeholder = self.container.empty()
+            tail = tail[boundary + 2:]
+        self.tail = [tail]
+        self.placeholder.markdown(tail + "|")
+        self.pending_chars = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """Render the full response as a single element and return it"""
+        response = "".join(self.parts)
+        # Reference links and loose lists only render correctly with the whole text in one element
+        placeholders = self.frozen + [self.placeholder]
+        for placeholder in placeholders[1:]:
+            placeholder.empty()
+        placeholders[0].markdown(response)
+        return response
 
 # Password protection
 def check_password():
@@ -70,7 +174,10 @@ def check_password():
 # Only show the main content if the password is correct
 if check_password():
     # Display chat messages
-    for message in st.session_state.messages:
+    conversation = conversation_store.load(session_id)
+    if conversation["summary"]:
+        st.caption("Earlier messages of this conversation have been summarized.")
+    for message in conversation["messages"]:
         avatar = "👩‍💻" if message["role"] == "user" else BOT_AVATAR
         with st.chat_message(message["role"], avatar=avatar):
             st.markdown(message["content"])
@@ -79,12 +186,7 @@ if check_password():
     if prompt := st.chat_input("Hi there! I am your virtual Aparavi assistant. How can I help?"):
         
         # Get the vectors    
-        response = client.embeddings.create(
-            input=prompt,
-            model="text-embedding-3-small"
-        )
-
-        queryVectors = response.data[0].embedding
+        queryVectors = embedding_backend.embed_query(prompt)
 
         # perform semantic search 
         semanticResponse = qdrant_client.search(
@@ -111,6 +213,7 @@ if check_password():
                   - Each unique link should appear only once
                   - Format links as clickable markdown: [Description](URL)
                   - Provide the link to the PDF and also to the website on the aparavi academy with a hint on the respective video tutorial
+                  - Video tutorials are listed in the "video_urls" field of the search results; link them directly when present
 
             3. Contact SUPPORT:
                If the user needs additional support, provide this structure:
@@ -139,7 +242,7 @@ if check_password():
             - If the query isn't specific, include the main documentation link
             """
         
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        conversation_store.append(session_id, {"role": "user", "content": prompt})
         
         # Display the user's message in the chat interface
         with st.chat_message("user", avatar="👩‍💻"):
@@ -147,16 +250,16 @@ if check_password():
 
         # Generate the response using the augmented prompt and chat history
         with st.chat_message("assistant", avatar=BOT_AVATAR):
-            message_placeholder = st.empty()
-            full_response = ""
+            renderer = StreamRenderer(st.container())
             for response in client.chat.completions.create(
                 model=st.session_state["openai_model"],
-                messages=st.session_state["messages"] + [{"role": "system", "content": augmentedPrompt}],
+                messages=conversation_store.prompt_messages(session_id) + [{"role": "system", "content": augmentedPrompt}],
                 stream=True,
             ):
-                full_response += response.choices[0].delta.content or ""
-                message_placeholder.markdown(full_response + "|")
-            message_placeholder.markdown(full_response)
+                renderer.write(response.choices[0].delta.content or "")
+            full_response = renderer.close()
         
         # Append the assistant's response to the chat history
-        st.session_state.messages.append({"role": "assistant", "content": full_response})
+        conversation_store.append(session_id, {"role": "assistant", "content": full_response})
+        # Summarize older messages only once the reply has been shown, so the user never waits for it
+        conversation_store.compact(session_id)